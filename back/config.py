@@ -11,6 +11,7 @@ then searches system PATH, requiring manual setting if not found.
 """
 
 import os
+import sys
 import logging
 import shutil  # Used to search system PATH
 from pathlib import Path # Use Path objects for consistency
@@ -66,8 +67,10 @@ ML_ANALYZER_DIR = PROJECT_ROOT / "back" / "ml_analyzer" # Base directory for the
 ML_MODEL_DIR = ML_ANALYZER_DIR / "models" # Directory containing model files
 
 # Default filenames - adjust if your files are named differently
-ML_MODEL_FILENAME_DEFAULT = "lightgbm_password_model.joblib"
-ML_FEATURES_FILENAME_DEFAULT = "feature_names.joblib"
+# Model in LightGBM's native text format, feature names as a NumPy string array.
+# Legacy '.joblib' exports are still accepted when configured via the env vars below.
+ML_MODEL_FILENAME_DEFAULT = "lightgbm_password_model.txt"
+ML_FEATURES_FILENAME_DEFAULT = "feature_names.npy"
 
 # Get filenames from environment or use defaults
 ML_MODEL_FILENAME = os.getenv("ML_MODEL_FILENAME", ML_MODEL_FILENAME_DEFAULT)
@@ -91,6 +94,68 @@ if not ML_FEATURES_PATH.is_file():
 else:
      logger_config.debug(f"ML Analyzer Config: Found feature names file at: {ML_FEATURES_PATH}")
 
+# Ahead-of-time compilation of the LightGBM model with treelite/tl2cgen (optional packages,
+# needs a C toolchain). When enabled and available, predictions use the compiled library.
+ML_AOT_COMPILE_DEFAULT = "true"
+ML_AOT_COMPILE = os.getenv("ML_AOT_COMPILE", ML_AOT_COMPILE_DEFAULT).lower() in ("1", "true", "yes")
+ML_AOT_TOOLCHAIN = os.getenv("ML_AOT_TOOLCHAIN", "gcc")
+# Quantized compilation replaces float threshold comparisons with small integer bin
+# indices in the generated C (identical predictions, tighter tree-walk loop).
+ML_AOT_QUANTIZE = os.getenv("ML_AOT_QUANTIZE", "true").lower() in ("1", "true", "yes")
+ML_COMPILED_LIB_SUFFIX = {"darwin": ".dylib", "win32": ".dll"}.get(sys.platform, ".so")
+ML_COMPILED_MODEL_PATH = Path(os.getenv("ML_COMPILED_MODEL_PATH", str(ML_MODEL_PATH.with_suffix(ML_COMPILED_LIB_SUFFIX))))
+logger_config.info(f"ML Analyzer Config: AOT model compilation {'enabled' if ML_AOT_COMPILE else 'disabled'} (library path: {ML_COMPILED_MODEL_PATH}, quantize: {ML_AOT_QUANTIZE})")
+
+# zxcvbn implementation used by the feature extractor:
+#   "python" - zxcvbn-python, identical to the training notebook (default)
+#   "rust"   - zxcvbn-rs-py bindings, far faster but exposes no match sequence, so it is
+#              only usable by models trained without 'has_dictionary_match'/'has_repeat_match'
+ML_ZXCVBN_BACKEND_DEFAULT = "python"
+ML_ZXCVBN_BACKEND = os.getenv("ML_ZXCVBN_BACKEND", ML_ZXCVBN_BACKEND_DEFAULT).lower()
+if ML_ZXCVBN_BACKEND not in ("python", "rust"):
+    logger_config.warning(f"Invalid ML_ZXCVBN_BACKEND '{ML_ZXCVBN_BACKEND}'. Must be 'python' or 'rust'. Using default: {ML_ZXCVBN_BACKEND_DEFAULT}")
+    ML_ZXCVBN_BACKEND = ML_ZXCVBN_BACKEND_DEFAULT
+logger_config.info(f"ML Analyzer Config: Requested zxcvbn backend: {ML_ZXCVBN_BACKEND}")
+
+# Micro-batching of concurrent /ml/analyze predictions: the batcher waits up to
+# ML_BATCH_WINDOW_MS after the first queued row (or until ML_MAX_BATCH_SIZE rows are
+# queued) before scoring them together. A window of 0 or a batch size of 1 disables it.
+ML_BATCH_WINDOW_MS_DEFAULT = 2.0
+ML_MAX_BATCH_SIZE_DEFAULT = 32
+ML_BATCH_WINDOW_MS_STR = os.getenv("ML_BATCH_WINDOW_MS", str(ML_BATCH_WINDOW_MS_DEFAULT))
+try:
+    ML_BATCH_WINDOW_MS: float = max(0.0, float(ML_BATCH_WINDOW_MS_STR))
+except ValueError:
+    logger_config.error(f"Invalid ML_BATCH_WINDOW_MS value '{ML_BATCH_WINDOW_MS_STR}'. Using default: {ML_BATCH_WINDOW_MS_DEFAULT}ms")
+    ML_BATCH_WINDOW_MS: float = ML_BATCH_WINDOW_MS_DEFAULT
+ML_MAX_BATCH_SIZE_STR = os.getenv("ML_MAX_BATCH_SIZE", str(ML_MAX_BATCH_SIZE_DEFAULT))
+try:
+    ML_MAX_BATCH_SIZE: int = max(1, int(ML_MAX_BATCH_SIZE_STR))
+except ValueError:
+    logger_config.error(f"Invalid ML_MAX_BATCH_SIZE value '{ML_MAX_BATCH_SIZE_STR}'. Using default: {ML_MAX_BATCH_SIZE_DEFAULT}")
+    ML_MAX_BATCH_SIZE: int = ML_MAX_BATCH_SIZE_DEFAULT
+ML_BATCHING_ENABLED = ML_BATCH_WINDOW_MS > 0 and ML_MAX_BATCH_SIZE > 1
+logger_config.info(f"ML Analyzer Config: Prediction micro-batching {'enabled' if ML_BATCHING_ENABLED else 'disabled'} (window={ML_BATCH_WINDOW_MS}ms, max batch={ML_MAX_BATCH_SIZE})")
+
+# Cache of /ml/analyze results keyed by a blake2b digest of the password (no plaintext
+# is stored). ML_RESULT_CACHE_SIZE=0 disables it, e.g. where policy forbids retaining
+# anything derived from submitted passwords.
+ML_RESULT_CACHE_SIZE_DEFAULT = 16384
+ML_RESULT_CACHE_TTL_S_DEFAULT = 300.0
+ML_RESULT_CACHE_SIZE_STR = os.getenv("ML_RESULT_CACHE_SIZE", str(ML_RESULT_CACHE_SIZE_DEFAULT))
+try:
+    ML_RESULT_CACHE_SIZE: int = max(0, int(ML_RESULT_CACHE_SIZE_STR))
+except ValueError:
+    logger_config.error(f"Invalid ML_RESULT_CACHE_SIZE value '{ML_RESULT_CACHE_SIZE_STR}'. Using default: {ML_RESULT_CACHE_SIZE_DEFAULT}")
+    ML_RESULT_CACHE_SIZE: int = ML_RESULT_CACHE_SIZE_DEFAULT
+ML_RESULT_CACHE_TTL_S_STR = os.getenv("ML_RESULT_CACHE_TTL_S", str(ML_RESULT_CACHE_TTL_S_DEFAULT))
+try:
+    ML_RESULT_CACHE_TTL_S: float = float(ML_RESULT_CACHE_TTL_S_STR)
+except ValueError:
+    logger_config.error(f"Invalid ML_RESULT_CACHE_TTL_S value '{ML_RESULT_CACHE_TTL_S_STR}'. Using default: {ML_RESULT_CACHE_TTL_S_DEFAULT}s")
+    ML_RESULT_CACHE_TTL_S: float = ML_RESULT_CACHE_TTL_S_DEFAULT
+logger_config.info(f"ML Analyzer Config: Result cache {'enabled' if ML_RESULT_CACHE_SIZE > 0 else 'disabled'} (size={ML_RESULT_CACHE_SIZE}, ttl={ML_RESULT_CACHE_TTL_S}s)")
+
 # --- Ollama Analyzer Configuration ---
 # Configuration for interacting with the local Ollama service. gemma3:1b-it-fp16 for demo purposes and gemma3:4b-it-q8_0 for production or llama3:8b
 OLLAMA_MODEL_DEFAULT = "gemma3:1b-it-fp16" # Example model
@@ -107,9 +172,121 @@ except ValueError:
     logger_config.error(f"Invalid OLLAMA_TIMEOUT value '{OLLAMA_TIMEOUT_STR}'. Using default: {OLLAMA_TIMEOUT_DEFAULT}s")
     OLLAMA_TIMEOUT: float = OLLAMA_TIMEOUT_DEFAULT
 
+OLLAMA_NUM_CTX_DEFAULT = 4096 # Context window (tokens) requested for each analysis; adjust for your model
+OLLAMA_NUM_CTX_STR = os.getenv("OLLAMA_NUM_CTX", str(OLLAMA_NUM_CTX_DEFAULT))
+try:
+    OLLAMA_NUM_CTX: int = int(OLLAMA_NUM_CTX_STR)
+except ValueError:
+    logger_config.error(f"Invalid OLLAMA_NUM_CTX value '{OLLAMA_NUM_CTX_STR}'. Using default: {OLLAMA_NUM_CTX_DEFAULT}")
+    OLLAMA_NUM_CTX: int = OLLAMA_NUM_CTX_DEFAULT
+# Largest model output (bytes) accepted per analysis; a runaway generation is aborted
+# as soon as it passes this, instead of being buffered and parsed in full.
+OLLAMA_MAX_RESPONSE_BYTES_DEFAULT = 65536
+OLLAMA_MAX_RESPONSE_BYTES_STR = os.getenv("OLLAMA_MAX_RESPONSE_BYTES", str(OLLAMA_MAX_RESPONSE_BYTES_DEFAULT))
+try:
+    OLLAMA_MAX_RESPONSE_BYTES: int = int(OLLAMA_MAX_RESPONSE_BYTES_STR)
+except ValueError:
+    logger_config.error(f"Invalid OLLAMA_MAX_RESPONSE_BYTES value '{OLLAMA_MAX_RESPONSE_BYTES_STR}'. Using default: {OLLAMA_MAX_RESPONSE_BYTES_DEFAULT}")
+    OLLAMA_MAX_RESPONSE_BYTES: int = OLLAMA_MAX_RESPONSE_BYTES_DEFAULT
+
+# When enabled, each request asks for the smallest power-of-two context (>= 256 tokens,
+# capped at OLLAMA_NUM_CTX) that fits its estimated prompt plus output tokens, so Ollama
+# reserves less KV cache per sequence. Disable if your Ollama server reloads the model on
+# every context-size change and you would rather keep a single fixed size.
+OLLAMA_DYNAMIC_NUM_CTX: bool = os.getenv("OLLAMA_DYNAMIC_NUM_CTX", "true").lower() in ("1", "true", "yes")
+
+# Cache of /ollama/generateContent responses keyed by a blake2b digest of model, options
+# and prompt. Only requests whose temperature is set and <= OLLAMA_CACHE_MAX_TEMPERATURE
+# are cached (default 0: greedy decoding only), so sampled outputs stay random.
+# OLLAMA_CACHE_SIZE=0 disables the cache.
+OLLAMA_CACHE_SIZE_DEFAULT = 1024
+OLLAMA_CACHE_TTL_S_DEFAULT = 3600.0
+OLLAMA_CACHE_MAX_TEMPERATURE_DEFAULT = 0.0
+OLLAMA_CACHE_SIZE_STR = os.getenv("OLLAMA_CACHE_SIZE", str(OLLAMA_CACHE_SIZE_DEFAULT))
+try:
+    OLLAMA_CACHE_SIZE: int = max(0, int(OLLAMA_CACHE_SIZE_STR))
+except ValueError:
+    logger_config.error(f"Invalid OLLAMA_CACHE_SIZE value '{OLLAMA_CACHE_SIZE_STR}'. Using default: {OLLAMA_CACHE_SIZE_DEFAULT}")
+    OLLAMA_CACHE_SIZE: int = OLLAMA_CACHE_SIZE_DEFAULT
+OLLAMA_CACHE_TTL_S_STR = os.getenv("OLLAMA_CACHE_TTL_S", str(OLLAMA_CACHE_TTL_S_DEFAULT))
+try:
+    OLLAMA_CACHE_TTL_S: float = float(OLLAMA_CACHE_TTL_S_STR)
+except ValueError:
+    logger_config.error(f"Invalid OLLAMA_CACHE_TTL_S value '{OLLAMA_CACHE_TTL_S_STR}'. Using default: {OLLAMA_CACHE_TTL_S_DEFAULT}s")
+    OLLAMA_CACHE_TTL_S: float = OLLAMA_CACHE_TTL_S_DEFAULT
+# Opt-in: key the response cache on the password embedded in the prompt (the frontend's
+# 'Analyze this password: "..."' line) instead of the whole prompt, so template or
+# boilerplate changes around the same password still hit the cache.
+OLLAMA_CACHE_BY_PASSWORD = os.getenv("OLLAMA_CACHE_BY_PASSWORD", "false").lower() in ("1", "true", "yes")
+OLLAMA_CACHE_MAX_TEMPERATURE_STR = os.getenv("OLLAMA_CACHE_MAX_TEMPERATURE", str(OLLAMA_CACHE_MAX_TEMPERATURE_DEFAULT))
+try:
+    OLLAMA_CACHE_MAX_TEMPERATURE: float = float(OLLAMA_CACHE_MAX_TEMPERATURE_STR)
+except ValueError:
+    logger_config.error(f"Invalid OLLAMA_CACHE_MAX_TEMPERATURE value '{OLLAMA_CACHE_MAX_TEMPERATURE_STR}'. Using default: {OLLAMA_CACHE_MAX_TEMPERATURE_DEFAULT}")
+    OLLAMA_CACHE_MAX_TEMPERATURE: float = OLLAMA_CACHE_MAX_TEMPERATURE_DEFAULT
+
+# Connection pool of the HTTP client used for Ollama. Keep-alive connections idle for up
+# to OLLAMA_KEEPALIVE_EXPIRY_S are reused; httpx's 5s default would drop them between
+# typical multi-second generations.
+OLLAMA_MAX_CONNECTIONS_DEFAULT = 64
+OLLAMA_MAX_KEEPALIVE_DEFAULT = 32
+OLLAMA_KEEPALIVE_EXPIRY_S_DEFAULT = 60.0
+try:
+    OLLAMA_MAX_CONNECTIONS: int = max(1, int(os.getenv("OLLAMA_MAX_CONNECTIONS", str(OLLAMA_MAX_CONNECTIONS_DEFAULT))))
+    OLLAMA_MAX_KEEPALIVE: int = max(0, int(os.getenv("OLLAMA_MAX_KEEPALIVE", str(OLLAMA_MAX_KEEPALIVE_DEFAULT))))
+    OLLAMA_KEEPALIVE_EXPIRY_S: float = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY_S", str(OLLAMA_KEEPALIVE_EXPIRY_S_DEFAULT)))
+except ValueError as e:
+    logger_config.error(f"Invalid Ollama connection pool setting ({e}). Using defaults: {OLLAMA_MAX_CONNECTIONS_DEFAULT} connections, {OLLAMA_MAX_KEEPALIVE_DEFAULT} keep-alive, {OLLAMA_KEEPALIVE_EXPIRY_S_DEFAULT}s expiry")
+    OLLAMA_MAX_CONNECTIONS = OLLAMA_MAX_CONNECTIONS_DEFAULT
+    OLLAMA_MAX_KEEPALIVE = OLLAMA_MAX_KEEPALIVE_DEFAULT
+    OLLAMA_KEEPALIVE_EXPIRY_S = OLLAMA_KEEPALIVE_EXPIRY_S_DEFAULT
+
+# Answer trivially weak passwords (shorter than OLLAMA_WEAK_MIN_LENGTH, or among the
+# OLLAMA_WEAK_COMMON_TOP_N most common passwords of zxcvbn's frequency list) with a fixed
+# analysis instead of an LLM generation.
+OLLAMA_WEAK_SHORTCUT: bool = os.getenv("OLLAMA_WEAK_SHORTCUT", "true").lower() in ("1", "true", "yes")
+OLLAMA_WEAK_MIN_LENGTH_DEFAULT = 6
+OLLAMA_WEAK_COMMON_TOP_N_DEFAULT = 10000
+try:
+    OLLAMA_WEAK_MIN_LENGTH: int = int(os.getenv("OLLAMA_WEAK_MIN_LENGTH", str(OLLAMA_WEAK_MIN_LENGTH_DEFAULT)))
+    OLLAMA_WEAK_COMMON_TOP_N: int = max(0, int(os.getenv("OLLAMA_WEAK_COMMON_TOP_N", str(OLLAMA_WEAK_COMMON_TOP_N_DEFAULT))))
+except ValueError as e:
+    logger_config.error(f"Invalid Ollama weak-password shortcut setting ({e}). Using defaults: min length {OLLAMA_WEAK_MIN_LENGTH_DEFAULT}, top {OLLAMA_WEAK_COMMON_TOP_N_DEFAULT} common passwords")
+    OLLAMA_WEAK_MIN_LENGTH = OLLAMA_WEAK_MIN_LENGTH_DEFAULT
+    OLLAMA_WEAK_COMMON_TOP_N = OLLAMA_WEAK_COMMON_TOP_N_DEFAULT
+
+# Constrain generation to the AnalysisResponse JSON schema (Ollama >= 0.5 structured outputs).
+# Set to false for older Ollama servers, which only accept format="json".
+OLLAMA_STRUCTURED_OUTPUT: bool = os.getenv("OLLAMA_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
+# Route Ollama HTTP traffic through aiohttp (requires httpx-aiohttp) instead of httpx's own transport
+OLLAMA_AIOHTTP_TRANSPORT: bool = os.getenv("OLLAMA_AIOHTTP_TRANSPORT", "true").lower() in ("1", "true", "yes")
+# Negotiate HTTP/2 with OLLAMA_HOST (requires httpx[http2]). Only useful when Ollama sits behind
+# a TLS reverse proxy: `ollama serve` itself speaks HTTP/1.1, where pooled keep-alive is used.
+# Takes precedence over the aiohttp transport, which is HTTP/1.1 only.
+OLLAMA_HTTP2: bool = os.getenv("OLLAMA_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# /ollama/generateContent:batch runs at most OLLAMA_BATCH_CONCURRENCY items at once. Ollama
+# itself decides how many requests it decodes together: OLLAMA_NUM_PARALLEL in the environment
+# of `ollama serve`, which is also used as the default here when set for this process.
+OLLAMA_BATCH_CONCURRENCY_DEFAULT = 4
+OLLAMA_BATCH_MAX_ITEMS_DEFAULT = 32
+try:
+    OLLAMA_BATCH_CONCURRENCY: int = max(1, int(os.getenv("OLLAMA_BATCH_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", str(OLLAMA_BATCH_CONCURRENCY_DEFAULT)))))
+    OLLAMA_BATCH_MAX_ITEMS: int = max(1, int(os.getenv("OLLAMA_BATCH_MAX_ITEMS", str(OLLAMA_BATCH_MAX_ITEMS_DEFAULT))))
+except ValueError as e:
+    logger_config.error(f"Invalid Ollama batch setting ({e}). Using defaults: concurrency {OLLAMA_BATCH_CONCURRENCY_DEFAULT}, max {OLLAMA_BATCH_MAX_ITEMS_DEFAULT} items")
+    OLLAMA_BATCH_CONCURRENCY = OLLAMA_BATCH_CONCURRENCY_DEFAULT
+    OLLAMA_BATCH_MAX_ITEMS = OLLAMA_BATCH_MAX_ITEMS_DEFAULT
+
 logger_config.info(f"Ollama Config: Using model '{OLLAMA_MODEL}'")
 logger_config.info(f"Ollama Config: Connecting to host '{OLLAMA_HOST}'")
 logger_config.info(f"Ollama Config: Request timeout set to {OLLAMA_TIMEOUT} seconds")
+logger_config.info(f"Ollama Config: Context window {'sized per request, up to' if OLLAMA_DYNAMIC_NUM_CTX else 'set to'} {OLLAMA_NUM_CTX} tokens")
+logger_config.info(f"Ollama Config: Model output limited to {OLLAMA_MAX_RESPONSE_BYTES} bytes")
+logger_config.info(f"Ollama Config: Batch endpoint runs up to {OLLAMA_BATCH_CONCURRENCY} of at most {OLLAMA_BATCH_MAX_ITEMS} items concurrently")
+logger_config.info(f"Ollama Config: Connection pool max={OLLAMA_MAX_CONNECTIONS}, keep-alive={OLLAMA_MAX_KEEPALIVE}, keep-alive expiry={OLLAMA_KEEPALIVE_EXPIRY_S}s")
+logger_config.info(f"Ollama Config: Response cache {'enabled' if OLLAMA_CACHE_SIZE > 0 else 'disabled'} (size={OLLAMA_CACHE_SIZE}, ttl={OLLAMA_CACHE_TTL_S}s, max temperature={OLLAMA_CACHE_MAX_TEMPERATURE}, keyed by {'password' if OLLAMA_CACHE_BY_PASSWORD else 'prompt'})")
 
 
 # --- Hashcat Cracker Configuration (Platform Independent Logic) ---
@@ -203,7 +380,34 @@ if LOG_LEVEL not in valid_log_levels:
     logger_config.warning(f"Invalid LOG_LEVEL '{LOG_LEVEL}'. Must be one of {valid_log_levels}. Using default: {LOG_LEVEL_DEFAULT}")
     LOG_LEVEL = LOG_LEVEL_DEFAULT
 
+# Uvicorn worker processes for `python -m back.main`. Extra workers parallelize request
+# parsing/validation/encoding across cores, but each one loads its own ML model, HIBP
+# checker and caches (and coalesces only its own requests), so the default stays 1.
+API_WORKERS_DEFAULT = 1
+API_WORKERS_STR = os.getenv("API_WORKERS", str(API_WORKERS_DEFAULT))
+try:
+    API_WORKERS: int = int(API_WORKERS_STR)
+    if API_WORKERS < 1:
+        raise ValueError("Worker count must be at least 1")
+except ValueError:
+    logger_config.error(f"Invalid API_WORKERS value '{API_WORKERS_STR}'. Must be a positive integer. Using default: {API_WORKERS_DEFAULT}")
+    API_WORKERS: int = API_WORKERS_DEFAULT
+
+# Origins allowed by CORS, comma-separated (e.g. "https://your-frontend-domain.com,http://localhost:5173").
+# The default "*" allows any origin, which is convenient locally but insecure for production.
+CORS_ALLOW_ORIGINS_DEFAULT = "*"
+CORS_ALLOW_ORIGINS: tuple = tuple(
+    origin.strip() for origin in os.getenv("CORS_ALLOW_ORIGINS", CORS_ALLOW_ORIGINS_DEFAULT).split(",") if origin.strip()
+) or (CORS_ALLOW_ORIGINS_DEFAULT,)
+
+# Uvicorn's per-request access log line (used by `python -m back.main`). Set to false in
+# production to save the log formatting and I/O on every request.
+API_ACCESS_LOG: bool = os.getenv("API_ACCESS_LOG", "true").lower() in ("1", "true", "yes")
+
 logger_config.info(f"General Config: Log Level set to: {LOG_LEVEL}")
+logger_config.info(f"General Config: {API_WORKERS} Uvicorn worker process(es)")
+logger_config.info(f"General Config: Access log {'enabled' if API_ACCESS_LOG else 'disabled'}")
+logger_config.info(f"General Config: CORS allowed origins: {', '.join(CORS_ALLOW_ORIGINS)}")
 logger_config.info(f"General Config: API server will run on: http://{API_HOST}:{API_PORT}")
 
 # --- Final Configuration Summary Log ---
@@ -57,8 +57,7 @@ bloom_filter_likely_active: bool = False
 # Create an APIRouter instance. This will be included by the main FastAPI app.
 router = APIRouter()
 
-# --- Lifespan Events (Startup and Shutdown) ---
-@router.on_event("startup")
+# --- Lifespan Events (Startup and Shutdown; called from the app lifespan in main.py) ---
 async def startup_hibp_checker():
     """
     Initializes the HIBP checker during application startup.
@@ -178,7 +177,6 @@ async def startup_hibp_checker():
              logger.error("HIBP checker initialization FAILED.")
 
 
-@router.on_event("shutdown")
 async def shutdown_hibp_checker():
     """
     Cleans up the HIBP checker instance and resources on application shutdown.
@@ -246,7 +244,7 @@ async def check_password_endpoint(
             detail=detail_msg
         )
 
-    logger.debug(f"Received request to check password (length={len(password)})")
+    logger.debug("Received request to check password (length=%d)", len(password))
 
     try:
         # --- Perform the Lookup ---
@@ -262,7 +260,7 @@ async def check_password_endpoint(
         else:
              check_method_info += "_without_bloom_filter"
 
-        logger.info(f"Password check result: {'Pwned' if is_pwned else 'Not Pwned'}. Method: {check_method_info}.")
+        logger.info("Password check result: %s. Method: %s.", 'Pwned' if is_pwned else 'Not Pwned', check_method_info)
 
         # --- Return the Result ---
         # Keep the response clear and focused.
@@ -7,42 +7,33 @@ includes API routers for different services (HIBP, Ollama), and defines
 a root endpoint.
 """
 import logging
-import uvicorn
 from fastapi import FastAPI, status
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 import sys
 from pathlib import Path
-# --- Path Setup for Imports ---
-# Ensure the project root and 'back' directory are in the Python path
-current_dir = Path(__file__).resolve().parent
-project_root = current_dir.parent
-if str(project_root) not in sys.path:
-    sys.path.insert(0, str(project_root))
-if str(current_dir) not in sys.path:
-     sys.path.insert(0, str(current_dir))
+
+# --- Package Execution Guard ---
+# The backend is a package ('back') and relies on relative imports; it must be
+# started through uvicorn (or `python -m back.main`) from the project root.
+if __name__ == "__main__" and not __package__:
+    print("\n--- ERROR: main.py must be run as part of the 'back' package ---")
+    print("Start the API from the project root with:")
+    print("  uvicorn back.main:app --host 0.0.0.0 --port 8000 --reload")
+    print("----------------------------------------------------------------\n")
+    sys.exit(1)
 
 # --- Import Configuration and Routers ---
-try:
-    from . import config
-    from .hibp_checker.router import router as hibp_router # Import HIBP router
-    from .ollama_analyzer.router import router as ollama_router # Import Ollama router
-    from .hashcat.router import router as hashcat_router
-    from .ml_analyzer.router import router as ml_router
-    from .ml_analyzer.router import load_ml_model
-except ImportError:
-    # Fallback for running the script directly (python back/main.py) - less ideal
-    try:
-        import config
-        from hibp_checker.router import router as hibp_router
-        from ollama_analyzer.router import router as ollama_router
-        from hashcat.router import router as hashcat_router
-        from ml_analyzer.router import router as ml_router
-        from ml_analyzer.router import load_ml_model
-    except ImportError as e2:
-         print(f"Fallback import failed: {e2}. Exiting.")
-         sys.exit(1) # Exit if core components can't be imported
+from . import config
+from .hibp_checker.router import router as hibp_router # Import HIBP router
+from .hibp_checker.router import startup_hibp_checker, shutdown_hibp_checker
+from .ollama_analyzer.router import router as ollama_router # Import Ollama router
+from .ollama_analyzer.router import startup_ollama_client, shutdown_ollama_client
+from .hashcat.router import router as hashcat_router
+from .ml_analyzer.router import router as ml_router
+from .ml_analyzer.router import load_ml_model, start_ml_batcher, stop_ml_batcher
 
 
 # --- Logging Setup ---
@@ -60,6 +51,28 @@ logger = logging.getLogger("main_app")
 logger.info(f"Logging configured with level: {config.LOG_LEVEL}")
 
 
+# --- Application Lifespan ---
+# Replaces the deprecated @app.on_event / @router.on_event hooks: every service is
+# started here before the first request and released (in reverse order) on shutdown.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the ML, HIBP and Ollama services on startup and cleans them up on shutdown."""
+    logger.info("Starting application...")
+
+    # Load ML model at startup
+    logger.info("Loading ML model...")
+    load_ml_model()
+    await startup_hibp_checker()
+    await startup_ollama_client()
+    await start_ml_batcher()
+    try:
+        yield
+    finally:
+        logger.info("Shutting down application...")
+        await stop_ml_batcher()
+        await shutdown_ollama_client()
+        await shutdown_hibp_checker()
+
 
 # --- FastAPI Application Initialization ---
 # Initialize the FastAPI application with metadata for documentation
@@ -83,32 +96,30 @@ app = FastAPI(
         "url": "https://opensource.org/licenses/MIT",
     },
     docs_url="/docs", # Endpoint for Swagger UI documentation
-    redoc_url="/redoc" # Endpoint for ReDoc documentation
+    redoc_url="/redoc", # Endpoint for ReDoc documentation
+    lifespan=lifespan, # Service startup/shutdown (see above)
 )
 
 # --- CORS Middleware Configuration ---
 # Configure Cross-Origin Resource Sharing (CORS) to allow frontend interactions.
-# SECURITY WARNING: Allowing all origins ["*"] is insecure for production environments.
-# In production, restrict origins to the specific domain(s) of your frontend application.
-# Example for production: origins = ["https://your-frontend-domain.com", "http://localhost:3000"]
-logger.warning("CORS middleware allows all origins ('*'). "
-               "This is insecure for production. Restrict origins in config/env vars.")
+# Origins come from CORS_ALLOW_ORIGINS (see config.py). The default "*" is insecure for
+# production: restrict it to the specific domain(s) of your frontend application.
+if "*" in config.CORS_ALLOW_ORIGINS:
+    logger.warning("CORS middleware allows all origins ('*'). "
+                   "This is insecure for production. Set CORS_ALLOW_ORIGINS to your frontend origin(s).")
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], # CHANGE FOR PRODUCTION! Read from config ideally.
+    allow_origins=config.CORS_ALLOW_ORIGINS,
     allow_credentials=True, # Allow cookies/auth headers if needed by your frontend
-    allow_methods=["GET", "POST", "OPTIONS"], # Specify allowed HTTP methods (more restrictive)
-    allow_headers=["*"], # Allow specific headers needed by the frontend, e.g., ["Content-Type", "Authorization"]
+    allow_methods=("GET", "POST", "OPTIONS"), # Specify allowed HTTP methods (more restrictive)
+    allow_headers=("Content-Type", "Accept"), # The headers the frontend sends (see src/api/*Service.ts)
 )
 
-@app.on_event("startup")
-def startup_event():
-    """Execute tasks when the application starts."""
-    logger.info("Starting application...")
-    
-    # Load ML model at startup
-    logger.info("Loading ML model...")
-    load_ml_model()
+# --- Response Compression ---
+# Gzip JSON bodies of at least 512 bytes (typical Ollama analyses, batch results) for
+# clients that accept it; level 5 keeps most of the size reduction at a fraction of level 9's CPU.
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     # Adjust the path to your favicon.ico file relative to main.py's location
@@ -193,9 +204,11 @@ async def read_root():
     }
 
 # --- Run Command (for development convenience) ---
-# This block allows running the app directly using `python back/main.py`,
+# This block allows running the app directly using `python -m back.main`,
 # but the recommended way for development is using `uvicorn back.main:app --reload`.
 if __name__ == "__main__":
+    import uvicorn # Only needed here; servers importing back.main:app already run their own
+
     logger.info(f"Attempting to start Uvicorn server programmatically on {config.API_HOST}:{config.API_PORT}")
     # Provide clear instructions for the recommended development approach
     print("\n--- Running main.py directly ---")
@@ -210,5 +223,7 @@ if __name__ == "__main__":
         host=config.API_HOST,
         port=config.API_PORT,
         log_level=config.LOG_LEVEL.lower(), # Sync Uvicorn log level with app config
+        access_log=config.API_ACCESS_LOG, # Per-request access lines; disable in production
+        workers=config.API_WORKERS, # Separate processes; needs the import-string app above
         reload=False # Auto-reload is better handled by the CLI runner
     )
\ No newline at end of file
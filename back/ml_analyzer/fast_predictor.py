@@ -0,0 +1,92 @@
+# back/ml_analyzer/fast_predictor.py
+"""
+Low-overhead LightGBM scoring through the C API's single-row fast path.
+
+Booster.predict() re-validates and converts its input and sets up a predictor on
+every call, which dominates the cost of scoring one row. LGBM_BoosterPredictForMatSingleRowFast
+does that set-up once (in a "FastConfig") and then scores a preallocated row
+directly. This is used when the AOT-compiled model (model_compiler.py) is not
+available. It relies on LightGBM's internal ctypes bindings; if they are missing,
+callers keep using Booster.predict().
+"""
+import ctypes
+import logging
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import lightgbm as lgb
+
+logger = logging.getLogger("ml_analyzer.fast_predictor")
+
+try:
+    from lightgbm.basic import _LIB, _safe_call, _c_str, _C_API_DTYPE_FLOAT32, _C_API_PREDICT_NORMAL
+    FAST_PREDICT_AVAILABLE = hasattr(_LIB, "LGBM_BoosterPredictForMatSingleRowFast")
+except ImportError:
+    FAST_PREDICT_AVAILABLE = False
+
+
+class SingleRowPredictor:
+    """
+    Scores rows of a Booster one at a time through a reusable FastConfig.
+
+    Not thread-safe: the FastConfig and output buffer are shared, so all calls
+    must come from one thread. In this service that is the router's single-worker
+    _predict_executor ("ml-predict") once the batcher runs; only the load-time
+    warm-up calls it earlier, from the event loop thread.
+    """
+
+    def __init__(self, booster: lgb.basic.Booster, params: Dict[str, Any]):
+        self._booster = booster # Keeps the underlying handle alive
+        self.num_features = booster.num_feature()
+        self.num_classes = booster.num_model_per_iteration()
+        self._row = np.zeros(self.num_features, dtype=np.float32)
+        self._out = np.zeros(self.num_classes, dtype=np.float64)
+        self._out_len = ctypes.c_int64(0)
+        self._fast_config = ctypes.c_void_p()
+        param_str = " ".join(f"{key}={str(value).lower() if isinstance(value, bool) else value}" for key, value in params.items())
+        _safe_call(_LIB.LGBM_BoosterPredictForMatSingleRowFastInit(
+            booster._handle,
+            ctypes.c_int(_C_API_PREDICT_NORMAL),
+            ctypes.c_int(0), # start_iteration
+            ctypes.c_int(getattr(booster, 'best_iteration', -1)),
+            ctypes.c_int(_C_API_DTYPE_FLOAT32),
+            ctypes.c_int32(self.num_features),
+            _c_str(param_str),
+            ctypes.byref(self._fast_config),
+        ))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Scores a (k, n_features) matrix row by row, returning (k, n_classes) probabilities."""
+        result = np.empty((features.shape[0], self.num_classes), dtype=np.float64)
+        row_ptr = self._row.ctypes.data_as(ctypes.c_void_p)
+        out_ptr = self._out.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+        for i in range(features.shape[0]):
+            self._row[:] = features[i]
+            _safe_call(_LIB.LGBM_BoosterPredictForMatSingleRowFast(
+                self._fast_config, row_ptr, ctypes.byref(self._out_len), out_ptr))
+            result[i] = self._out
+        return result
+
+    def __del__(self):
+        if getattr(self, '_fast_config', None) is not None and self._fast_config.value is not None:
+            _LIB.LGBM_FastConfigFree(self._fast_config)
+            self._fast_config = None
+
+
+def create_fast_predictor(model: Union[lgb.basic.Booster, lgb.LGBMClassifier],
+                          params: Dict[str, Any]) -> Optional[SingleRowPredictor]:
+    """
+    Returns a SingleRowPredictor for `model` using the given predict parameters,
+    or None if the fast path is unavailable or cannot be initialised.
+    """
+    if not FAST_PREDICT_AVAILABLE:
+        logger.info("LightGBM single-row fast predict API not available; using Booster.predict.")
+        return None
+    try:
+        booster = model.booster_ if isinstance(model, lgb.LGBMClassifier) else model
+        predictor = SingleRowPredictor(booster, params)
+        logger.info("LightGBM single-row fast predictor initialised.")
+        return predictor
+    except Exception as e:
+        logger.warning(f"Could not initialise LightGBM single-row fast predictor ({type(e).__name__}: {e}). Using Booster.predict.")
+        return None
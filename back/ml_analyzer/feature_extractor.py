@@ -1,11 +1,9 @@
 # back/ml_analyzer/feature_extractor.py
-import pandas as pd
 import numpy as np
-import math
 import logging
 import decimal # Import decimal for type checking if needed
-import datetime # Import datetime for type checking if needed
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 # Ensure zxcvbn is installed: pip install zxcvbn-python
 try:
@@ -18,144 +16,262 @@ except ImportError:
 # Use the logger configured in router/main
 logger = logging.getLogger("ml_analyzer.feature_extractor")
 
+# Optional Rust implementation of zxcvbn: pip install zxcvbn-rs-py
+try:
+    import zxcvbn_rs_py
+except ImportError:
+    zxcvbn_rs_py = None
+
+# Numba is optional: without it the packing kernel below runs as plain Python.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    logger.warning("numba not installed; feature packing runs in pure Python (pip install numba for the compiled kernel).")
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is unavailable."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# --- Canonical Feature Layout ---
+# Order in which _pack_features writes its output. The model's feature_names
+# (from feature_names.npy) are mapped onto these positions, so the kernel
+# never needs to know the training-time column order.
+CANONICAL_FEATURE_NAMES: Tuple[str, ...] = (
+    'password_length',
+    'guesses_log10',
+    'crack_time_log10',
+    'calc_time_ms',
+    'has_dictionary_match',
+    'has_repeat_match',
+    'count_lower',
+    'count_digit',
+    'count_symbol',
+    'is_empty',
+)
+_IDX_PASSWORD_LENGTH = 0
+_IDX_IS_EMPTY = 9
+# All-zero row used when zxcvbn overflows; copied, then length/is_empty filled in
+_ZERO_FEATURES_TEMPLATE = np.zeros(len(CANONICAL_FEATURE_NAMES), dtype=np.float32)
+
+# Features derived from zxcvbn's match 'sequence', which the Rust bindings do not expose
+SEQUENCE_FEATURE_NAMES: Tuple[str, ...] = ('has_dictionary_match', 'has_repeat_match')
+
+# Active zxcvbn implementation ("python" or "rust"), see select_zxcvbn_backend()
+zxcvbn_backend: str = "python"
+
+# Representative ASCII bytes used to encode non-ASCII passwords per character class
+_CLASS_LOWER, _CLASS_UPPER, _CLASS_DIGIT, _CLASS_OTHER = ord('a'), ord('A'), ord('0'), ord('!')
+
+# --- Compiled Packing Kernel ---
+
+@njit(cache=True)
+def _pack_features(pw_bytes, guesses_log10, crack_time, calc_time_ms, has_dict, has_rep, out):
+    """
+    Fills `out` (float32, CANONICAL_FEATURE_NAMES order) from the zxcvbn scalars
+    and a single pass over the password bytes (one byte per character).
+    """
+    n = pw_bytes.shape[0]
+    count_lower = 0
+    count_upper = 0
+    count_digit = 0
+    for i in range(n):
+        c = pw_bytes[i]
+        if 97 <= c <= 122:
+            count_lower += 1
+        elif 65 <= c <= 90:
+            count_upper += 1
+        elif 48 <= c <= 57:
+            count_digit += 1
+    out[0] = n
+    out[1] = guesses_log10
+    # Small epsilon prevents log10(0) or log10(negative) issues, matching notebook
+    out[2] = np.log10(max(crack_time, 1e-12) + 1e-9)
+    out[3] = calc_time_ms
+    out[4] = has_dict
+    out[5] = has_rep
+    out[6] = count_lower
+    out[7] = count_digit
+    out[8] = n - (count_lower + count_upper + count_digit)
+    out[9] = 1.0 if n == 0 else 0.0
+
+
+def _password_to_class_bytes(password: str) -> np.ndarray:
+    """
+    Returns one uint8 per character for the packing kernel. ASCII passwords are
+    used as-is; other passwords are mapped per character onto a representative
+    byte of the same class (str.islower/isupper/isdigit), so Unicode characters
+    are counted exactly like the training notebook did.
+    """
+    if password.isascii():
+        return np.frombuffer(password.encode('ascii'), dtype=np.uint8)
+    return np.fromiter(
+        (_CLASS_LOWER if ch.islower() else _CLASS_UPPER if ch.isupper() else _CLASS_DIGIT if ch.isdigit() else _CLASS_OTHER
+         for ch in password),
+        dtype=np.uint8,
+        count=len(password),
+    )
+
+
+def select_zxcvbn_backend(requested: str, feature_names: List[str]) -> str:
+    """
+    Selects the zxcvbn implementation used by extract_features.
+
+    The Rust backend is only activated when the bindings are installed and the
+    model does not depend on match-sequence features; otherwise the pure-Python
+    zxcvbn (used during training) stays active. Returns the active backend name.
+    """
+    global zxcvbn_backend
+    zxcvbn_backend = "python"
+    if requested != "rust":
+        return zxcvbn_backend
+    if zxcvbn_rs_py is None:
+        logger.warning("zxcvbn backend 'rust' requested but zxcvbn-rs-py is not installed (pip install zxcvbn-rs-py). Using zxcvbn-python.")
+        return zxcvbn_backend
+    needs_sequence = [name for name in feature_names if name in SEQUENCE_FEATURE_NAMES]
+    if needs_sequence:
+        logger.warning(f"zxcvbn backend 'rust' requested but the model uses match-sequence features {needs_sequence}, "
+                       "which zxcvbn-rs-py does not expose. Using zxcvbn-python.")
+        return zxcvbn_backend
+    zxcvbn_backend = "rust"
+    logger.info("Using zxcvbn-rs-py (Rust) for feature extraction.")
+    return zxcvbn_backend
+
+
+def _run_zxcvbn(password: str) -> dict:
+    """Runs the active zxcvbn backend, returning zxcvbn-python's result schema."""
+    if zxcvbn_backend == "rust":
+        result = zxcvbn_rs_py.zxcvbn(password)
+        return {
+            'guesses_log10': result.guesses_log10,
+            'crack_times_seconds': {
+                'offline_fast_hashing_1e10_per_second': result.crack_times_seconds.offline_fast_hashing_1e10_per_second,
+            },
+            'calc_time': result.calc_time / 1000.0, # Rust reports milliseconds
+            'sequence': [],
+        }
+    return zxcvbn(password)
+
+
+@lru_cache(maxsize=8)
+def _feature_positions(feature_names: Tuple[str, ...]) -> np.ndarray:
+    """Maps the model's feature order onto CANONICAL_FEATURE_NAMES positions."""
+    missing_features = [name for name in feature_names if name not in CANONICAL_FEATURE_NAMES]
+    if missing_features:
+        # This indicates a mismatch between this module's logic and the expected feature_names list
+        logger.error(f"Internal logic error: Cannot calculate all expected features. Missing: {missing_features}")
+        raise ValueError(f"Internal error: Missing expected features during calculation: {missing_features}")
+    return np.array([CANONICAL_FEATURE_NAMES.index(name) for name in feature_names], dtype=np.intp)
+
+
+def _to_float(value, name: str) -> float:
+    """Converts a zxcvbn scalar to float, falling back to 0.0 like the notebook."""
+    try:
+        return float(value)
+    except (ValueError, TypeError, OverflowError):
+        if value != 0.0:
+            logger.warning(f"Could not convert {name} '{value}' to float. Using 0.0.")
+        return 0.0
+
+
+def _calc_time_to_ms(calc_time_value) -> float:
+    """Converts zxcvbn's calc_time (float seconds or timedelta) to milliseconds."""
+    # Handle different types returned by zxcvbn (float or timedelta) as in notebook
+    if isinstance(calc_time_value, (int, float, decimal.Decimal)):
+        return _to_float(calc_time_value, 'calc_time') * 1000.0
+    if hasattr(calc_time_value, 'total_seconds'): # Check for timedelta-like object
+        try:
+            return float(calc_time_value.total_seconds()) * 1000.0
+        except Exception as e:
+            logger.warning(f"Could not convert timedelta-like calc_time '{calc_time_value}' to ms float: {e}")
+            return 0.0
+    if calc_time_value != 0.0:
+        logger.warning(f"Unexpected type for calc_time '{type(calc_time_value)}' value '{calc_time_value}'. Using 0.0 ms.")
+    return 0.0
+
 # --- Feature Extraction Logic (Aligned with Training Notebook) ---
 
-def extract_features(password: str, feature_names: List[str]) -> pd.DataFrame:
+def extract_features(password: str, feature_names: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Extracts features from a password using zxcvbn, precisely matching the
     logic and feature selection from the training notebook (LightGBM.ipynb).
 
-    This function calculates only the features specified in `feature_names`,
-    which should correspond to the 'feature_names.joblib' file saved during training.
+    zxcvbn runs in Python; its scalar results are then packed together with the
+    character-class counts by the `_pack_features` kernel (Numba-compiled when
+    available) and written positionally, in `feature_names` order, into a
+    float32 row that can be passed straight to the model.
 
     Args:
         password: The password string to analyze.
         feature_names: The exact list of feature names (and their order)
-                       expected by the trained model (loaded from feature_names.joblib).
+                       expected by the trained model (loaded from feature_names.npy).
                        Based on the notebook, this should be:
                        ['password_length', 'guesses_log10', 'crack_time_log10',
                         'calc_time_ms', 'has_dictionary_match', 'has_repeat_match',
                         'count_lower', 'count_digit', 'count_symbol', 'is_empty']
+        out: Optional preallocated np.float32 array of shape (1, len(feature_names))
+             to write into. A new array is allocated when omitted.
 
     Returns:
-        A pandas DataFrame with a single row containing the extracted features,
-        ordered according to `feature_names` and typed as np.float32.
+        A (1, len(feature_names)) np.float32 array (`out` if given) whose columns
+        are ordered according to `feature_names`.
 
     Raises:
         ValueError: If feature extraction fails, a required feature cannot be
-                    calculated, or the final DataFrame structure is invalid.
+                    calculated, or `out` has the wrong shape/dtype.
     """
-    logger.debug(f"Starting feature extraction for password (length {len(password)}). Expecting features: {feature_names}")
-    # Dictionary to hold calculated features before ordering
-    calculated_features: Dict[str, Any] = {}
+    password_length = len(password)
+    logger.debug("Starting feature extraction for password (length %d). Expecting features: %s", password_length, feature_names)
+    positions = _feature_positions(tuple(feature_names))
+    packed = np.empty(len(CANONICAL_FEATURE_NAMES), dtype=np.float32)
 
     # --- Consistent Handling of Empty Passwords (as per notebook) ---
-    is_empty_flag = 1.0 if not password else 0.0
+    is_empty_flag = 0.0 if password else 1.0
     # zxcvbn requires non-empty input, use a space if original is empty
     password_to_analyze = password if password else " "
-    password_length = float(len(password)) # Calculate length of original password
 
     try:
         # --- Run ZXCVBN Analysis ---
-        # logger.debug("Running zxcvbn analysis...")
-        analysis_start_time = datetime.datetime.now()
-        analysis = zxcvbn(password_to_analyze)
-        analysis_duration = (datetime.datetime.now() - analysis_start_time).total_seconds()
-        # logger.debug(f"zxcvbn analysis completed in {analysis_duration:.6f} seconds.")
-
-        # --- Calculate ONLY the Features Used in Training (Based on feature_names) ---
-        # These calculations directly mirror the logic within the notebook's
-        # feature_engineer function *after* feature dropping.
-
-        # 1. 'password_length'
-        if 'password_length' in feature_names:
-            calculated_features['password_length'] = password_length
-
-        # 2. 'guesses_log10'
-        if 'guesses_log10' in feature_names:
-            guesses_log10_val = analysis.get('guesses_log10', 0.0)
-            try:
-                calculated_features['guesses_log10'] = float(guesses_log10_val)
-            except (ValueError, TypeError, OverflowError):
-                logger.warning(f"Could not convert guesses_log10 '{guesses_log10_val}' to float. Using 0.0.")
-                calculated_features['guesses_log10'] = 0.0
-
-        # 3. 'crack_time_log10'
-        if 'crack_time_log10' in feature_names:
-            # Use 'offline_fast_hashing_1e10_per_second' as per notebook example
-            crack_time_seconds = analysis.get('crack_times_seconds', {}).get('offline_fast_hashing_1e10_per_second', 0.0)
-            crack_time_float = 0.0
-            try:
-                crack_time_float = float(crack_time_seconds)
-            except (ValueError, TypeError, OverflowError):
-                 if crack_time_seconds != 0.0:
-                     logger.warning(f"Could not convert crack_time_seconds '{crack_time_seconds}' to float. Using 0.0.")
-            # Add small epsilon to prevent log10(0) or log10(negative) issues, matching notebook
-            calculated_features['crack_time_log10'] = np.log10(max(crack_time_float, 1e-12) + 1e-9)
-
-        # 4. 'calc_time_ms'
-        if 'calc_time_ms' in feature_names:
-            calc_time_value = analysis.get('calc_time', 0.0)
-            calc_time_ms_float = 0.0
-            # Handle different types returned by zxcvbn (float or timedelta) as in notebook
-            if isinstance(calc_time_value, (int, float, decimal.Decimal)):
-                try:
-                    calc_time_ms_float = float(calc_time_value) * 1000.0
-                except (ValueError, TypeError, OverflowError):
-                    if calc_time_value != 0.0: logger.warning(f"Could not convert numeric calc_time '{calc_time_value}' to ms float.")
-            elif hasattr(calc_time_value, 'total_seconds'): # Check for timedelta-like object
-                 try:
-                     calc_time_ms_float = float(calc_time_value.total_seconds()) * 1000.0
-                 except Exception as e:
-                     logger.warning(f"Could not convert timedelta-like calc_time '{calc_time_value}' to ms float: {e}")
-            else:
-                 if calc_time_value != 0.0: logger.warning(f"Unexpected type for calc_time '{type(calc_time_value)}' value '{calc_time_value}'. Using 0.0 ms.")
-            calculated_features['calc_time_ms'] = calc_time_ms_float
-
-        # 5. Match Features (based on 'sequence' list in zxcvbn results)
-        current_sequence = analysis.get('sequence', [])
-        if 'has_dictionary_match' in feature_names:
-            calculated_features['has_dictionary_match'] = 1.0 if any(m.get('pattern') == 'dictionary' for m in current_sequence) else 0.0
-        if 'has_repeat_match' in feature_names:
-            calculated_features['has_repeat_match'] = 1.0 if any(m.get('pattern') == 'repeat' for m in current_sequence) else 0.0
-        # NOTE: Other match features ('spatial', 'date', 'l33t', 'sequence') were DROPPED in the notebook and are NOT calculated here.
-
-        # 6. Character Counts
-        count_lower = float(sum(1 for char in password if char.islower()))
-        count_upper = float(sum(1 for char in password if char.isupper())) # Need upper count to calculate symbol count
-        count_digit = float(sum(1 for char in password if char.isdigit()))
-        count_symbol = password_length - (count_lower + count_upper + count_digit)
-
-        if 'count_lower' in feature_names:
-            calculated_features['count_lower'] = count_lower
-        if 'count_digit' in feature_names:
-            calculated_features['count_digit'] = count_digit
-        if 'count_symbol' in feature_names:
-            calculated_features['count_symbol'] = count_symbol
-        # NOTE: 'count_upper' was DROPPED in the notebook and is NOT included in calculated_features.
-
-        # 7. 'is_empty' flag
-        if 'is_empty' in feature_names:
-            calculated_features['is_empty'] = is_empty_flag
-
-        # --- Verification Step ---
-        # Ensure all features requested in feature_names were actually calculated
-        missing_features = [name for name in feature_names if name not in calculated_features]
-        if missing_features:
-            # This indicates a mismatch between this function's logic and the expected feature_names list
-            logger.error(f"Internal logic error: Failed to calculate all expected features. Missing: {missing_features}")
-            raise ValueError(f"Internal error: Missing expected features during calculation: {missing_features}")
-
-        logger.debug(f"Successfully calculated {len(calculated_features)} raw features.")
+        analysis = _run_zxcvbn(password_to_analyze)
+
+        # --- Extract zxcvbn Scalars (Python side) ---
+        guesses_log10 = _to_float(analysis.get('guesses_log10', 0.0), 'guesses_log10')
+        # Use 'offline_fast_hashing_1e10_per_second' as per notebook example
+        crack_time_seconds = _to_float(
+            analysis.get('crack_times_seconds', {}).get('offline_fast_hashing_1e10_per_second', 0.0),
+            'crack_time_seconds',
+        )
+        calc_time_ms = _calc_time_to_ms(analysis.get('calc_time', 0.0))
+
+        # Match Features (based on 'sequence' list in zxcvbn results)
+        # NOTE: Other match features ('spatial', 'date', 'l33t', 'sequence') were DROPPED in the notebook.
+        # Single pass over the sequence, stopping once both flags are set.
+        has_dict = has_rep = 0.0
+        for match in analysis.get('sequence', []):
+            pattern = match.get('pattern')
+            if pattern == 'dictionary':
+                has_dict = 1.0
+            elif pattern == 'repeat':
+                has_rep = 1.0
+            if has_dict and has_rep:
+                break
+
+        # --- Pack Length, Counts and Scalars (compiled kernel) ---
+        # NOTE: 'count_upper' was DROPPED in the notebook; it is only used to derive count_symbol.
+        _pack_features(_password_to_class_bytes(password), guesses_log10, crack_time_seconds,
+                       calc_time_ms, has_dict, has_rep, packed)
+        logger.debug("Successfully packed raw features.")
 
     except OverflowError as ofe:
          # Handle specific zxcvbn errors if necessary, mirroring notebook
-         logger.warning(f"OverflowError during zxcvbn analysis for password (len {len(password)}): {ofe}. Proceeding with potentially zeroed features.")
-         # Create a dictionary with zeros for all expected features if zxcvbn fails catastrophically
-         calculated_features = {name: 0.0 for name in feature_names}
-         # Ensure 'is_empty' is set correctly even in this error case
-         if 'is_empty' in calculated_features: calculated_features['is_empty'] = is_empty_flag
-         if 'password_length' in calculated_features: calculated_features['password_length'] = password_length
+         logger.warning(f"OverflowError during zxcvbn analysis for password (len {password_length}): {ofe}. Proceeding with potentially zeroed features.")
+         # Zero all features if zxcvbn fails catastrophically, keeping length and 'is_empty' correct
+         packed = _ZERO_FEATURES_TEMPLATE.copy()
+         packed[_IDX_PASSWORD_LENGTH] = password_length
+         packed[_IDX_IS_EMPTY] = is_empty_flag
 
     except Exception as e:
         logger.error(f"Unexpected error during zxcvbn analysis or feature calculation: {type(e).__name__}: {e}", exc_info=True)
@@ -163,32 +279,21 @@ def extract_features(password: str, feature_names: List[str]) -> pd.DataFrame:
         raise ValueError(f"Feature extraction failed due to unexpected error: {e}") from e
 
 
-    # --- Create DataFrame in the CORRECT order and type ---
-    try:
-        # Use the feature_names list passed as argument to select and order features.
-        # Use .get() with a default of 0.0 for safety, although the check above should prevent missing keys.
-        feature_data_ordered = {name: calculated_features.get(name, 0.0) for name in feature_names}
-
-        # Create a single-row DataFrame
-        features_df = pd.DataFrame([feature_data_ordered], columns=feature_names)
-
-        # Final type conversion to float32, as used in the notebook before training/prediction
-        features_df = features_df.astype(np.float32)
-
-        logger.debug(f"Feature extraction successful. Final DataFrame shape: {features_df.shape}, Dtypes: {features_df.dtypes.unique()}")
-
-    except Exception as e:
-        logger.error(f"Error creating or typing the final feature DataFrame: {e}", exc_info=True)
-        raise ValueError(f"Failed to create or type final feature DataFrame: {e}") from e
-
-    return features_df
+    # --- Write Features in the CORRECT order ---
+    if out is None:
+        out = np.empty((1, len(positions)), dtype=np.float32)
+    elif out.shape != (1, len(positions)) or out.dtype != np.float32:
+        raise ValueError(f"Output buffer must be float32 with shape (1, {len(positions)}); got {out.dtype} {out.shape}.")
+    np.take(packed, positions, out=out[0])
+    logger.debug("Feature extraction successful. Final array shape: %s", out.shape)
+    return out
 
 # --- Example Usage (for testing this file directly) ---
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s [%(name)-25s] [%(levelname)-8s] %(message)s')
     logger = logging.getLogger("feature_extractor_test") # Use a distinct logger name for testing
 
-    # CRITICAL: This list MUST match the columns saved in your 'feature_names.joblib'
+    # CRITICAL: This list MUST match the columns saved in your 'feature_names.npy'
     # Based on the notebook's 'feature_names_used' after dropping columns
     expected_feature_names_from_notebook = [
         'password_length',
@@ -209,19 +314,18 @@ if __name__ == "__main__":
         print("-" * 30)
         logger.info(f"Testing password: '{test_password}'")
         try:
-            df = extract_features(test_password, expected_feature_names_from_notebook)
+            features = extract_features(test_password, expected_feature_names_from_notebook)
             print(f"\n--- Features for '{test_password}' ---")
-            print(df.to_string(index=False)) # Print full DataFrame row without index
-            print("DataFrame columns:", df.columns.tolist())
-            print("DataFrame dtypes:", df.dtypes.tolist())
+            for name, value in zip(expected_feature_names_from_notebook, features[0]):
+                print(f"  {name:<22} {value}")
 
-            # Verify order and names match exactly
-            assert df.columns.tolist() == expected_feature_names_from_notebook, "Column names or order mismatch!"
-            print("✅ Column names and order MATCH expected.")
+            # Verify shape matches the expected feature list
+            assert features.shape == (1, len(expected_feature_names_from_notebook)), "Feature array shape mismatch!"
+            print("✅ Feature array shape MATCHES expected.")
 
             # Verify dtype is float32
-            assert all(dtype == np.float32 for dtype in df.dtypes), "Not all dtypes are float32!"
-            print("✅ All column dtypes MATCH expected (float32).")
+            assert features.dtype == np.float32, "Feature array dtype is not float32!"
+            print("✅ Feature array dtype MATCHES expected (float32).")
             print("✅ Test PASSED")
 
         except (ValueError, AssertionError) as e:
@@ -0,0 +1,105 @@
+# back/ml_analyzer/model_compiler.py
+"""
+Ahead-of-time compilation of the LightGBM model using treelite + tl2cgen.
+
+The trained Booster is translated into C, compiled into a shared library and
+loaded through a tl2cgen Predictor, which scores rows without going through
+LightGBM's generic predict path. The library name embeds the model file's mtime,
+so warm boots reuse it instead of recompiling. Both packages are optional; when
+they (or a C toolchain) are missing, callers keep using the Booster.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+import lightgbm as lgb
+
+logger = logging.getLogger("ml_analyzer.model_compiler")
+
+try:
+    import treelite
+    import tl2cgen
+    TREELITE_AVAILABLE = True
+except ImportError:
+    treelite = None
+    tl2cgen = None
+    TREELITE_AVAILABLE = False
+
+
+def is_compiled_predictor(model: Any) -> bool:
+    """True if `model` is a tl2cgen Predictor returned by compile_model()."""
+    return TREELITE_AVAILABLE and isinstance(model, tl2cgen.Predictor)
+
+
+def predict_compiled(predictor: Any, features: np.ndarray) -> np.ndarray:
+    """Scores a (k, n_features) matrix, returning (k, n_classes) probabilities."""
+    return predictor.predict(tl2cgen.DMatrix(features)).reshape(features.shape[0], -1)
+
+
+def _cached_library_path(libpath: Path, model_path: Path, quantize: bool) -> Path:
+    """Library path keyed by the model file's mtime and build flavour, e.g. model.1714000000123456789.q.so"""
+    flavour = ".q" if quantize else ""
+    return libpath.with_name(f"{libpath.stem}.{model_path.stat().st_mtime_ns}{flavour}{libpath.suffix}")
+
+
+def _remove_stale_libraries(libpath: Path, keep: Path) -> None:
+    """Deletes libraries compiled from previous versions of the model file."""
+    for stale in libpath.parent.glob(f"{libpath.stem}.*{libpath.suffix}"):
+        if stale != keep:
+            try:
+                stale.unlink()
+                logger.debug(f"Removed stale compiled model: {stale}")
+            except OSError as e:
+                logger.warning(f"Could not remove stale compiled model '{stale}': {e}")
+
+
+def compile_model(model: Union[lgb.basic.Booster, lgb.LGBMClassifier], model_path: Path, libpath: Path,
+                  toolchain: str = "gcc", quantize: bool = True) -> Optional[Any]:
+    """
+    Loads (or compiles) the shared library for `model` and returns a tl2cgen Predictor.
+
+    `model_path` is the model file `model` was loaded from; its mtime (and
+    `quantize`) keys the cached library derived from `libpath`. With `quantize`,
+    split thresholds are compiled as integer bin indices instead of float
+    comparisons. Returns None if compilation is unavailable or fails.
+    """
+    if not TREELITE_AVAILABLE:
+        logger.info("treelite/tl2cgen not installed; using LightGBM predict (pip install treelite tl2cgen to enable AOT compilation).")
+        return None
+
+    try:
+        cached_libpath = _cached_library_path(libpath, model_path, quantize)
+        start_time = time.time()
+        if cached_libpath.is_file():
+            logger.info(f"Loading cached compiled model from {cached_libpath}...")
+        else:
+            booster = model.booster_ if isinstance(model, lgb.LGBMClassifier) else model
+            best_iteration = getattr(booster, 'best_iteration', -1)
+            if 0 < best_iteration < booster.current_iteration():
+                # The Booster predicts with num_iteration=best_iteration; compile exactly those trees
+                booster = lgb.Booster(model_str=booster.model_to_string(num_iteration=best_iteration))
+
+            logger.info(f"Compiling LightGBM model to {cached_libpath} (toolchain: {toolchain})...")
+            tl_model = treelite.frontend.from_lightgbm(booster)
+            # Build under a per-process name next to the target and rename it into place:
+            # with several workers starting cold, none may load a half-written library
+            # (export_lib's own move is a plain copy across filesystems). The .tmp suffix
+            # also keeps other workers' _remove_stale_libraries() away from it.
+            temp_libpath = cached_libpath.with_name(f"{cached_libpath.name}.{os.getpid()}.tmp")
+            try:
+                tl2cgen.export_lib(tl_model, toolchain=toolchain, libpath=str(temp_libpath),
+                                   params={'parallel_comp': 8, 'quantize': int(quantize)})
+                os.replace(temp_libpath, cached_libpath)
+            finally:
+                temp_libpath.unlink(missing_ok=True)
+            _remove_stale_libraries(libpath, keep=cached_libpath)
+        # Single-row requests gain nothing from threading inside the predictor
+        predictor = tl2cgen.Predictor(str(cached_libpath), nthread=1)
+        logger.info(f"Compiled model ready in {time.time() - start_time:.2f} seconds.")
+        return predictor
+    except Exception as e:
+        logger.warning(f"AOT compilation of the LightGBM model failed ({type(e).__name__}: {e}). Using LightGBM predict.")
+        return None
@@ -1,5 +1,5 @@
 # back/ml_analyzer/models.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Dict, List
 
 class PasswordInput(BaseModel):
@@ -16,8 +16,8 @@ class MLAnalysisResult(BaseModel):
     analysis_time_seconds: float = Field(..., description="Total time taken for feature extraction and model prediction in seconds.")
     model_info: str = Field("LightGBM Classifier (Trained on RockYou Sample)", description="Identifier for the model used.")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "predicted_strength_label": "🔥 Weak (Score: 1)",
                 "predicted_strength_score": 1,
@@ -32,4 +32,5 @@ class MLAnalysisResult(BaseModel):
                 "analysis_time_seconds": 0.0152,
                 "model_info": "LightGBM Classifier (Trained on RockYou Sample)"
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
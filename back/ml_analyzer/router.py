@@ -1,26 +1,32 @@
 # back/ml_analyzer/router.py
 import time
+import asyncio
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, status, Depends
 from pathlib import Path
-import joblib
-import pandas as pd
 import numpy as np
 import lightgbm as lgb
+from cachetools import TTLCache
 from typing import List, Dict, Any, Tuple, Union # <--- IMPORT List and others
 
 # Use relative imports within the 'back' package
 try:
     from .. import config
     from .models import PasswordInput, MLAnalysisResult
-    from .feature_extractor import extract_features
+    from .feature_extractor import extract_features, select_zxcvbn_backend
+    from .model_compiler import compile_model, is_compiled_predictor, predict_compiled
+    from .fast_predictor import SingleRowPredictor, create_fast_predictor
 except ImportError:
     # Fallback for running directly (less ideal)
     import sys
     sys.path.append(str(Path(__file__).resolve().parents[1])) # Add 'back' parent dir
     import config
     from ml_analyzer.models import PasswordInput, MLAnalysisResult
-    from ml_analyzer.feature_extractor import extract_features
+    from ml_analyzer.feature_extractor import extract_features, select_zxcvbn_backend
+    from ml_analyzer.model_compiler import compile_model, is_compiled_predictor, predict_compiled
+    from ml_analyzer.fast_predictor import SingleRowPredictor, create_fast_predictor
     print("Warning: Running ml_analyzer/router.py potentially outside of package context. Using fallback imports.")
 
 
@@ -35,8 +41,53 @@ router = APIRouter()
 lgbm_model: Union[lgb.basic.Booster, lgb.LGBMClassifier, None] = None
 feature_names: Union[List[str], None] = None # Use imported List
 model_load_error: Union[str, None] = None
+# md5 of the verified feature column order (set by load_ml_model, logged for deployment checks)
+FEATURE_COLS_HASH: Union[str, None] = None
+# tl2cgen Predictor compiled from lgbm_model (None when AOT compilation is disabled/unavailable)
+compiled_predictor: Any = None
+# LightGBM C API single-row predictor, used when no compiled predictor is available
+fast_predictor: Union[SingleRowPredictor, None] = None
+
+# --- Prediction Micro-Batching ---
+# Concurrent /analyze requests are coalesced: the batcher waits up to
+# config.ML_BATCH_WINDOW_MS after the first queued password (or until
+# config.ML_MAX_BATCH_SIZE are queued), then extracts all their features into one
+# (k, n) matrix and scores it with a single predict call.
+_predict_queue: Union[asyncio.Queue, None] = None
+_batcher_task: Union[asyncio.Task, None] = None
+
+# --- Prediction Thread ---
+# Model calls run off the event loop on one dedicated thread: the predictors go
+# through ctypes (which releases the GIL) and the fast predictor's buffers are not
+# thread-safe, so a single thread both serializes them and keeps the loop free.
+# Keep max_workers=1 while SingleRowPredictor (fast_predictor.py) is in use: a second
+# thread would race on its shared FastConfig and output buffers.
+_predict_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-predict")
+
+# --- Booster Predict Parameters ---
+# Early stopping halts tree traversal once the top class leads by pred_early_stop_margin
+# (checked every pred_early_stop_freq iterations). A margin of 10.0 leaves every predicted
+# class unchanged on the bundled model. Rows are scored on one thread, since OpenMP start-up
+# costs more than it saves at these batch sizes.
+ML_BOOSTER_PREDICT_PARAMS = {
+    'pred_early_stop': True,
+    'pred_early_stop_freq': 10,
+    'pred_early_stop_margin': 10.0,
+    'num_threads': 1,
+}
+
+# --- Result Cache ---
+# /analyze is deterministic in the password for a loaded model, so results are cached.
+# Keys are blake2b digests of the password, so no plaintext is retained in memory.
+# Size/TTL come from config (ML_RESULT_CACHE_SIZE=0 disables caching).
+_result_cache: Union[TTLCache, None] = (
+    TTLCache(maxsize=config.ML_RESULT_CACHE_SIZE, ttl=config.ML_RESULT_CACHE_TTL_S)
+    if config.ML_RESULT_CACHE_SIZE > 0 else None
+)
 
 # --- Strength Mapping (Consistent Labels) ---
+ML_NUM_CLASSES = 5 # Strength scores 0-4; validated against the model in load_ml_model()
+_SCORE_KEYS = tuple(f"Score {i}" for i in range(ML_NUM_CLASSES))
 STRENGTH_LABELS = {
     0: "🚨 Very Weak",
     1: "🔥 Weak",
@@ -47,18 +98,50 @@ STRENGTH_LABELS = {
 STRENGTH_EMOJIS = {
     0: "🚨", 1: "🔥", 2: "⚠️", 3: "✅", 4: "🚀"
 }
+# Full response labels, materialized once since there are only ML_NUM_CLASSES of them
+PRECOMPUTED_LABELS = tuple(
+    f"{STRENGTH_EMOJIS.get(i, '❓')} {STRENGTH_LABELS.get(i, 'Unknown Score')} (Score: {i})" for i in range(ML_NUM_CLASSES)
+)
 
 # --- Model Loading Logic (Called during application startup) ---
+def _load_model_file(model_path: Path) -> Union[lgb.basic.Booster, lgb.LGBMClassifier]:
+    """
+    Loads the model from LightGBM's native text format (.txt), or from a
+    legacy joblib pickle (.joblib) exported by older training runs.
+    """
+    if model_path.suffix == ".joblib":
+        import joblib # Only needed for legacy exports
+        logger.warning(f"Loading legacy joblib model '{model_path.name}'. Re-export with booster.save_model() for faster, pickle-free loading.")
+        return joblib.load(model_path)
+    return lgb.Booster(model_file=str(model_path))
+
+
+def _load_feature_names_file(features_path: Path) -> List[str]:
+    """
+    Loads the feature names from a NumPy string array (.npy), or from a
+    legacy joblib pickle (.joblib) exported by older training runs.
+    """
+    if features_path.suffix == ".joblib":
+        import joblib # Only needed for legacy exports
+        logger.warning(f"Loading legacy joblib feature names '{features_path.name}'. Re-export with np.save() for pickle-free loading.")
+        return joblib.load(features_path)
+    return np.load(features_path, allow_pickle=False).tolist()
+
 def load_ml_model():
     """
     Loads the LightGBM model and feature names from disk using paths from config.
     Stores them in global variables or logs errors. Includes enhanced validation.
     """
-    global lgbm_model, feature_names, model_load_error
+    global lgbm_model, feature_names, model_load_error, compiled_predictor, fast_predictor, FEATURE_COLS_HASH
     logger.info("Attempting to load ML model and feature names...")
     model_load_error = None
     lgbm_model = None
     feature_names = None
+    compiled_predictor = None
+    fast_predictor = None
+    FEATURE_COLS_HASH = None
+    if _result_cache is not None:
+        _result_cache.clear() # Cached results belong to the previously loaded model
     loaded_model = None
     loaded_feature_names = None
 
@@ -74,22 +157,30 @@ def load_ml_model():
             raise FileNotFoundError(f"ML Feature names file not found at configured path: {features_path}")
         logger.info("Model and features files found.")
 
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         logger.debug(f"Loading model from {model_path}...")
-        loaded_model = joblib.load(model_path)
+        loaded_model = _load_model_file(model_path)
         logger.info(f"Model loaded. Type: {type(loaded_model)}")
 
         logger.debug(f"Loading features from {features_path}...")
-        loaded_feature_names = joblib.load(features_path)
+        loaded_feature_names = _load_feature_names_file(features_path)
         logger.info(f"Features loaded. Type: {type(loaded_feature_names)}")
-        load_time = time.time() - start_time
-        logger.debug(f"File loading took {load_time:.4f} seconds.")
+        logger.debug(f"File loading took {(time.perf_counter_ns() - start_ns) / 1e9:.4f} seconds.")
 
         logger.debug("Validating loaded model type...")
         if not isinstance(loaded_model, (lgb.basic.Booster, lgb.LGBMClassifier)):
             raise TypeError(f"Loaded model file '{model_path.name}' did not contain a valid LightGBM Booster or Classifier. Found type: {type(loaded_model)}.")
         logger.info(f"Model type validation successful. Found: {type(loaded_model).__name__}")
 
+        logger.debug("Validating model class count...")
+        if isinstance(loaded_model, lgb.basic.Booster):
+            model_num_classes = loaded_model.num_model_per_iteration()
+        else:
+            model_num_classes = getattr(loaded_model, 'n_classes_', None)
+        if model_num_classes != ML_NUM_CLASSES:
+            raise ValueError(f"Loaded model '{model_path.name}' predicts {model_num_classes} classes, expected {ML_NUM_CLASSES}.")
+        logger.info(f"Model class count validation successful ({ML_NUM_CLASSES} classes).")
+
         logger.debug("Validating loaded features type...")
         if not isinstance(loaded_feature_names, list): # Check against built-in list type
             raise TypeError(f"Loaded features file '{features_path.name}' did not contain a list. Found type: {type(loaded_feature_names)}.")
@@ -111,12 +202,42 @@ def load_ml_model():
         logger.debug(f"Global lgbm_model type after assignment: {type(lgbm_model)}")
         logger.debug(f"Global feature_names type after assignment: {type(feature_names)}")
 
+        active_backend = select_zxcvbn_backend(config.ML_ZXCVBN_BACKEND, feature_names)
+        logger.info(f"Feature extraction will use the '{active_backend}' zxcvbn backend.")
+
+        # Startup invariant: the extractor produces exactly the model's columns, in order,
+        # as a float32 (1, n) row. analyze_password_ml trusts this and does not re-check it.
+        model_num_features = lgbm_model.num_feature() if isinstance(lgbm_model, lgb.basic.Booster) else lgbm_model.n_features_in_
+        if model_num_features != len(feature_names):
+            raise ValueError(f"Model expects {model_num_features} features but '{features_path.name}' lists {len(feature_names)}.")
+        smoke_features = extract_features("Smoke_Test_Password_123!", feature_names)
+        if smoke_features.shape != (1, len(feature_names)) or smoke_features.dtype != np.float32:
+            raise ValueError(f"Feature extractor returned {smoke_features.dtype} array of shape {smoke_features.shape}, expected float32 (1, {len(feature_names)}).")
+        FEATURE_COLS_HASH = hashlib.md5(",".join(feature_names).encode('utf-8')).hexdigest()
+        logger.info(f"Feature extractor contract verified ({len(feature_names)} columns, hash {FEATURE_COLS_HASH}).")
+
+        if config.ML_AOT_COMPILE:
+            compiled_predictor = compile_model(lgbm_model, model_path, config.ML_COMPILED_MODEL_PATH,
+                                               toolchain=config.ML_AOT_TOOLCHAIN, quantize=config.ML_AOT_QUANTIZE)
+        if compiled_predictor is None:
+            fast_predictor = create_fast_predictor(lgbm_model, ML_BOOSTER_PREDICT_PARAMS)
+
+        # Warm-up: runs one prediction (the smoke extraction above already loaded the Numba
+        # packing kernel) so the first real request does not pay the JIT and first-call costs.
+        try:
+            start_ns = time.perf_counter_ns()
+            warmup_model = next(m for m in (compiled_predictor, fast_predictor, lgbm_model) if m is not None)
+            _predict_probabilities(warmup_model, smoke_features)
+            logger.info(f"ML inference warm-up completed in {(time.perf_counter_ns() - start_ns) / 1e9:.4f} seconds.")
+        except Exception as e:
+            logger.warning(f"ML inference warm-up failed ({type(e).__name__}: {e}); first request may be slower.")
+
     except FileNotFoundError as e:
         logger.error(f"ML Model Loading Error: {e}")
         model_load_error = str(e)
-    except (joblib.externals.loky.process_executor.TerminatedWorkerError, EOFError, TypeError, ValueError) as e:
-        logger.error(f"ML Model Loading Error: Failed to load or validate joblib file. Error: {e}", exc_info=True)
-        model_load_error = f"Failed to load/validate joblib file ({type(e).__name__}): {e}"
+    except (lgb.basic.LightGBMError, EOFError, TypeError, ValueError) as e:
+        logger.error(f"ML Model Loading Error: Failed to load or validate model files. Error: {e}", exc_info=True)
+        model_load_error = f"Failed to load/validate model files ({type(e).__name__}): {e}"
     except Exception as e:
         logger.exception(f"ML Model Loading Error: An unexpected error occurred during loading.")
         model_load_error = f"Unexpected loading error: {type(e).__name__}"
@@ -134,14 +255,150 @@ def load_ml_model():
         logger.info("Final check confirms model and features are loaded into global variables.")
 
 
+# --- Prediction Helpers ---
+def _predict_probabilities(model: Any, features: np.ndarray) -> np.ndarray:
+    """Runs the model on a (k, n_features) matrix and returns (k, n_classes) probabilities."""
+    if is_compiled_predictor(model):
+        return predict_compiled(model, features)
+    elif isinstance(model, SingleRowPredictor):
+        return model.predict(features)
+    elif isinstance(model, lgb.basic.Booster):
+        return model.predict(
+            features,
+            num_iteration=getattr(model, 'best_iteration', -1), # Use best_iteration if exists
+            **ML_BOOSTER_PREDICT_PARAMS
+        )
+    elif isinstance(model, lgb.LGBMClassifier):
+        return model.predict_proba(features)
+    raise TypeError(f"Unsupported model type for prediction: {type(model)}")
+
+
+def _score_passwords(model: Any, passwords: List[str], feature_names: List[str]) -> Tuple[List[int], Union[np.ndarray, None], List[Union[Exception, None]]]:
+    """
+    Runs on the prediction thread: extracts features for all `passwords` straight
+    into one (k, n_features) matrix and scores it with a single predict call.
+
+    Returns (scored row indices, their (len, n_classes) probabilities, per-password
+    extraction errors), so one failing password does not fail the whole batch.
+    """
+    features = np.empty((len(passwords), len(feature_names)), dtype=np.float32)
+    errors: List[Union[Exception, None]] = [None] * len(passwords)
+    for i, password in enumerate(passwords):
+        try:
+            extract_features(password, feature_names, out=features[i:i + 1])
+        except ValueError as e:
+            errors[i] = e
+    scored = [i for i, error in enumerate(errors) if error is None]
+    if not scored:
+        return scored, None, errors
+    if len(scored) != len(passwords):
+        features = features[scored]
+    return scored, _predict_probabilities(model, features), errors
+
+
+def _resolve_futures(batch: List[Tuple[Any, str, List[str], asyncio.Future]], scored: List[int],
+                     probabilities: Union[np.ndarray, None], errors: List[Union[Exception, None]]) -> None:
+    """Hands each queued request its probability row or extraction error."""
+    for i, error in enumerate(errors):
+        future = batch[i][3]
+        if not future.done() and error is not None:
+            future.set_exception(error)
+    for row, i in enumerate(scored):
+        future = batch[i][3]
+        if not future.done():
+            future.set_result(probabilities[row:row + 1])
+
+
+async def _batch_predict_worker():
+    """Background task draining the prediction queue and scoring passwords in batches."""
+    loop = asyncio.get_running_loop()
+    window_s = config.ML_BATCH_WINDOW_MS / 1000.0
+    while True:
+        batch = [await _predict_queue.get()]
+        deadline = loop.time() + window_s
+        while len(batch) < config.ML_MAX_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_predict_queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests whose callers went away (e.g. client disconnect) are skipped
+        batch = [item for item in batch if not item[3].done()]
+        if not batch:
+            continue
+        try:
+            model, _, feature_names_batch, _ = batch[0]
+            scored, probabilities, errors = await loop.run_in_executor(
+                _predict_executor, _score_passwords, model, [password for _, password, _, _ in batch], feature_names_batch
+            )
+            logger.debug("Scored micro-batch of %d/%d password(s).", len(scored), len(batch))
+        except Exception as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        _resolve_futures(batch, scored, probabilities, errors)
+
+
+async def score_batched(model: Any, password: str, feature_names: List[str]) -> np.ndarray:
+    """
+    Extracts features for `password` and scores it through the micro-batcher,
+    returning (1, n_classes) probabilities. Falls back to a direct call on the
+    prediction thread when the batcher is not running.
+    """
+    if _batcher_task is None or _batcher_task.done():
+        scored, probabilities, errors = await asyncio.get_running_loop().run_in_executor(
+            _predict_executor, _score_passwords, model, [password], feature_names
+        )
+        if errors[0] is not None:
+            raise errors[0]
+        return probabilities
+    future = asyncio.get_running_loop().create_future()
+    await _predict_queue.put((model, password, feature_names, future))
+    return await future
+
+
+async def start_ml_batcher():
+    """Starts the prediction micro-batcher task (called from the app lifespan in main.py)."""
+    global _predict_queue, _batcher_task
+    if not config.ML_BATCHING_ENABLED:
+        logger.info("ML prediction batching disabled; rows are scored per request.")
+        return
+    if _batcher_task is not None and not _batcher_task.done():
+        logger.info("ML prediction batcher already running.")
+        return
+    _predict_queue = asyncio.Queue()
+    _batcher_task = asyncio.create_task(_batch_predict_worker())
+    logger.info(f"ML prediction batcher started (window={config.ML_BATCH_WINDOW_MS}ms, max batch={config.ML_MAX_BATCH_SIZE}).")
+
+
+async def stop_ml_batcher():
+    """Cancels the prediction micro-batcher task."""
+    global _predict_queue, _batcher_task
+    if _batcher_task is not None:
+        _batcher_task.cancel()
+        try:
+            await _batcher_task
+        except asyncio.CancelledError:
+            pass
+    _batcher_task = None
+    _predict_queue = None
+    logger.info("ML prediction batcher stopped.")
+
+
 # --- Dependency for Model Access ---
 # Use Tuple from typing for the return type hint
-def get_model_and_features() -> Tuple[Union[lgb.basic.Booster, lgb.LGBMClassifier], List[str]]:
+def get_model_and_features() -> Tuple[Any, List[str]]:
     """
     FastAPI dependency to provide the loaded model and features.
+    The AOT-compiled predictor (or else the single-row fast predictor) is provided
+    instead of the LightGBM model when available.
     Raises HTTPException 503 if the model isn't ready.
     """
-    global lgbm_model, feature_names, model_load_error
+    global lgbm_model, feature_names, model_load_error, compiled_predictor, fast_predictor
     if model_load_error:
         logger.warning(f"ML Model access denied: Loading previously failed with error: {model_load_error}")
         raise HTTPException(
@@ -156,6 +413,10 @@ def get_model_and_features() -> Tuple[Union[lgb.basic.Booster, lgb.LGBMClassifie
             detail="ML Model Service Unavailable: Model not loaded correctly. Check server logs.",
         )
     # Return the loaded objects if they are ready
+    if compiled_predictor is not None:
+        return compiled_predictor, feature_names
+    if fast_predictor is not None:
+        return fast_predictor, feature_names
     return lgbm_model, feature_names
 
 # --- API Endpoints ---
@@ -176,92 +437,64 @@ def get_model_and_features() -> Tuple[Union[lgb.basic.Booster, lgb.LGBMClassifie
 async def analyze_password_ml(
     payload: PasswordInput,
     # Use dependency injection to ensure model is ready and get access to it
-    model_data: Tuple[Union[lgb.basic.Booster, lgb.LGBMClassifier], List[str]] = Depends(get_model_and_features) # Use Tuple type hint
+    model_data: Tuple[Any, List[str]] = Depends(get_model_and_features) # Use Tuple type hint
 ):
     """
     Analyzes the password using the loaded LightGBM model and feature extractor.
     """
     lgbm_model_dep, feature_names_dep = model_data
     password = payload.password
-    logger.info(f"Received request to analyze password (length: {len(password)}) with ML model.")
+    logger.info("Received request to analyze password (length: %d) with ML model.", len(password))
 
-    analysis_start_time = time.time()
+    analysis_start_ns = time.perf_counter_ns()
 
-    try:
-        logger.debug("Extracting features...")
-        extract_start_time = time.time()
-        features_df = extract_features(password, feature_names_dep)
-        extract_time = time.time() - extract_start_time
-        logger.debug(f"Feature extraction complete in {extract_time:.6f} seconds. DataFrame shape: {features_df.shape}")
-
-        if not isinstance(features_df, pd.DataFrame):
-             raise TypeError(f"Feature extraction returned unexpected type: {type(features_df)}")
-        if features_df.shape[0] != 1:
-             raise ValueError(f"Feature extraction did not return exactly one row. Shape: {features_df.shape}")
-        if features_df.shape[1] != len(feature_names_dep):
-             raise ValueError(f"Feature extraction returned wrong number of columns. Expected {len(feature_names_dep)}, Got {features_df.shape[1]}")
-
-        extracted_columns = features_df.columns.tolist()
-        if extracted_columns != feature_names_dep:
-             logger.error("CRITICAL FEATURE MISMATCH DETECTED POST-EXTRACTION!")
-             logger.error(f"--> Expected features (from {config.ML_FEATURES_PATH.name}): {feature_names_dep}")
-             logger.error(f"--> Actual features extracted: {extracted_columns}")
-             logger.error("Ensure feature_extractor.py calculates and orders features exactly as defined in feature_names.joblib used for training.")
-             raise RuntimeError("Internal Server Error: Feature mismatch between extraction logic and loaded feature names.")
-
-        features_for_prediction = features_df
-
-        logger.debug("Performing model prediction...")
-        pred_start_time = time.time()
-
-        if isinstance(lgbm_model_dep, lgb.basic.Booster):
-            logger.debug("Using Booster.predict method.")
-            predicted_probabilities_array = lgbm_model_dep.predict(
-                features_for_prediction.values,
-                num_iteration=getattr(lgbm_model_dep, 'best_iteration', -1) # Use best_iteration if exists
-            )
-        elif isinstance(lgbm_model_dep, lgb.LGBMClassifier):
-            logger.debug("Using LGBMClassifier.predict_proba method.")
-            predicted_probabilities_array = lgbm_model_dep.predict_proba(
-                features_for_prediction
-            )
-        else:
-            raise TypeError(f"Unsupported model type for prediction: {type(lgbm_model_dep)}")
+    cache_key = None
+    if _result_cache is not None:
+        cache_key = hashlib.blake2b(password.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        cached_result = _result_cache.get(cache_key)
+    if cache_key is not None and cached_result is not None:
+        lookup_time_seconds = (time.perf_counter_ns() - analysis_start_ns) / 1e9
+        logger.info("ML analysis served from cache in %.6f seconds. Predicted Score: %s", lookup_time_seconds, cached_result.predicted_strength_score)
+        return cached_result.model_copy(update={'analysis_time_seconds': round(lookup_time_seconds, 6)})
 
-        pred_time = time.time() - pred_start_time
-        logger.debug(f"Model prediction took {pred_time:.6f} seconds")
+    try:
+        logger.debug("Extracting features and performing model prediction...")
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            pred_start_ns = time.perf_counter_ns()
 
-        if predicted_probabilities_array.ndim != 2 or predicted_probabilities_array.shape[0] != 1:
-             raise ValueError(f"Model prediction returned unexpected shape: {predicted_probabilities_array.shape}")
+        # Feature extraction (zxcvbn, CPU-bound) and prediction both run on the prediction
+        # thread, batched with concurrent requests; column order is guaranteed by construction.
+        predicted_probabilities_array = await score_batched(lgbm_model_dep, password, feature_names_dep)
 
-        probabilities = predicted_probabilities_array[0]
-        predicted_score = int(np.argmax(probabilities))
-        confidence = float(probabilities[predicted_score])
+        if debug_enabled:
+            logger.debug("Feature extraction and model prediction took %.6f seconds", (time.perf_counter_ns() - pred_start_ns) / 1e9)
 
-        num_classes = 5
-        if len(probabilities) != num_classes:
-            logger.warning(f"Prediction returned {len(probabilities)} probabilities, expected {num_classes}. Padding/truncating.")
-            adjusted_probs = np.zeros(num_classes)
-            limit = min(len(probabilities), num_classes)
-            adjusted_probs[:limit] = probabilities[:limit]
-            probabilities = adjusted_probs
+        if predicted_probabilities_array.shape != (1, ML_NUM_CLASSES):
+             raise ValueError(f"Model prediction returned unexpected shape: {predicted_probabilities_array.shape}")
 
-        probabilities_dict = {f"Score {i}": float(prob) for i, prob in enumerate(probabilities)}
+        # Class count is validated at load time, so no padding is needed here
+        probabilities = predicted_probabilities_array[0].tolist()
+        predicted_score = max(range(ML_NUM_CLASSES), key=probabilities.__getitem__) # First max, like np.argmax
+        confidence = probabilities[predicted_score]
+        probabilities_dict = dict(zip(_SCORE_KEYS, probabilities))
 
-        strength_label_base = STRENGTH_LABELS.get(predicted_score, "Unknown Score")
-        strength_emoji = STRENGTH_EMOJIS.get(predicted_score, "❓")
-        predicted_strength_label = f"{strength_emoji} {strength_label_base} (Score: {predicted_score})"
+        predicted_strength_label = PRECOMPUTED_LABELS[predicted_score] # predicted_score < ML_NUM_CLASSES by the shape check
 
-        analysis_time_seconds = time.time() - analysis_start_time
-        logger.info(f"ML analysis completed in {analysis_time_seconds:.4f} seconds. Predicted Score: {predicted_score}, Confidence: {confidence:.4f}")
+        analysis_time_seconds = (time.perf_counter_ns() - analysis_start_ns) / 1e9
+        logger.info("ML analysis completed in %.4f seconds. Predicted Score: %s, Confidence: %.4f", analysis_time_seconds, predicted_score, confidence)
 
-        result = MLAnalysisResult(
+        # Every field is built above with the declared type (str, int, float, Dict[str, float]),
+        # so model_construct skips re-validating values this function just computed
+        result = MLAnalysisResult.model_construct(
             predicted_strength_label=predicted_strength_label,
             predicted_strength_score=predicted_score,
             confidence=confidence,
             probabilities=probabilities_dict,
             analysis_time_seconds=round(analysis_time_seconds, 6),
         )
+        if cache_key is not None:
+            _result_cache[cache_key] = result
         return result
 
     except ValueError as e:
@@ -299,7 +532,7 @@ async def analyze_password_ml(
 )
 async def health_check():
     """Provides the loading status of the ML model and features."""
-    global lgbm_model, feature_names, model_load_error
+    global lgbm_model, feature_names, model_load_error, compiled_predictor, fast_predictor
     status_info = {"status": "unknown", "message": "Checking status..."}
 
     if model_load_error:
@@ -309,6 +542,8 @@ async def health_check():
     elif lgbm_model and feature_names:
         status_info["status"] = "ready"
         status_info["message"] = f"Ready: LightGBM model ({type(lgbm_model).__name__}) and {len(feature_names)} features loaded successfully."
+        status_info["compiled_predictor"] = compiled_predictor is not None
+        status_info["fast_predictor"] = fast_predictor is not None
         logger.info(f"ML Analyzer health check: Ready.")
     else:
         status_info["status"] = "error"
@@ -1,11 +1,17 @@
 # /your_project_root/back/ollama_analyzer/models.py
-from pydantic import BaseModel, Field
+import logging
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Optional # Make sure Optional is imported
+from typing_extensions import TypedDict # pydantic requires typing_extensions.TypedDict before Python 3.12
 
-class Part(BaseModel):
+logger = logging.getLogger("ollama_analyzer.models")
+
+# The request's contents/parts wrappers are TypedDicts: pydantic-core still enforces
+# their shape and types, but produces plain dicts instead of a model instance per level.
+class Part(TypedDict):
     text: str
 
-class Content(BaseModel):
+class Content(TypedDict):
     parts: List[Part]
 
 class GenerationConfig(BaseModel):
@@ -23,4 +29,66 @@ class AnalysisResponse(BaseModel):
     suggestions: List[str]
     reasoning: List[str]
     # Allow improvedPassword to be None if the AI doesn't provide it
-    improvedPassword: Optional[str] = None # <-- Change here
\ No newline at end of file
+    improvedPassword: Optional[str] = None # <-- Change here
+
+
+class BatchAnalysisItem(BaseModel):
+    """One entry of a /generateContent:batch response: the analysis, or the error of that request."""
+    status_code: int
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+
+def _clean_text_list(value: Any, max_items: Optional[int] = None) -> List[str]:
+    """Keeps the non-empty strings of a list (or a lone string), stripped once each, up to max_items."""
+    if isinstance(value, str):
+        value = (value,)
+    elif not isinstance(value, list):
+        return []
+    cleaned: List[str] = []
+    for item in value:
+        if isinstance(item, str):
+            item = item.strip()
+            if item:
+                cleaned.append(item)
+                if len(cleaned) == max_items:
+                    break
+    return cleaned
+
+class OllamaAnalysisOutput(AnalysisResponse):
+    """
+    AnalysisResponse parsed straight from the LLM's JSON output with
+    model_validate_json(). The validators tolerate the usual LLM deviations
+    (strings instead of lists, empty or non-string items, missing fields).
+    """
+    suggestions: List[str] = Field(default_factory=list, validate_default=True)
+    reasoning: List[str] = Field(default_factory=list, validate_default=True)
+    improvedPassword: Optional[str] = Field(None, validate_default=True)
+
+    @field_validator('reasoning', mode='before')
+    @classmethod
+    def clean_reasoning(cls, value: Any) -> List[str]:
+        cleaned = _clean_text_list(value, max_items=2)
+        if not cleaned:
+            logger.warning("Ollama 'reasoning' invalid/missing (%s). Defaulting.", type(value))
+            cleaned = ["Analysis details not provided."]
+        return cleaned
+
+    @field_validator('suggestions', mode='before')
+    @classmethod
+    def clean_suggestions(cls, value: Any) -> List[str]:
+        cleaned = _clean_text_list(value)
+        if not cleaned:
+            logger.warning("Ollama 'suggestions' invalid/missing (%s). Defaulting.", type(value))
+            cleaned = ["No specific suggestions provided."]
+        return cleaned
+
+    @field_validator('improvedPassword', mode='before')
+    @classmethod
+    def clean_improved_password(cls, value: Any) -> Optional[str]:
+        if isinstance(value, str):
+            value = value.strip()
+            if value:
+                return value
+        logger.warning("Ollama 'improvedPassword' invalid/missing (%s). Setting None.", type(value))
+        return None
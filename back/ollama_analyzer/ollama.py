@@ -1,7 +1,7 @@
 # /your_project_root/back/ollama_analyzer/router.py
 import logging
-import json
 import sys
+import orjson
 from typing import Union, Optional
 from fastapi import APIRouter, HTTPException, status
 
@@ -80,9 +80,9 @@ async def generate_ollama_content(request: OllamaApiRequest):
 
     logger.info(f"Received request for Ollama model: {config.OLLAMA_MODEL}")
     try:
-        if not request.contents or not request.contents[0].parts:
+        if not request.contents or not request.contents[0]['parts']:
             raise HTTPException(status_code=400, detail="Invalid request: Missing contents or parts.")
-        prompt = request.contents[0].parts[0].text
+        prompt = request.contents[0]['parts'][0]['text']
         logger.info(f"Extracted Prompt (first 100 chars): {prompt[:100]}...")
     except Exception as e:
         logger.error(f"Error extracting prompt: {e}", exc_info=True)
@@ -105,11 +105,11 @@ async def generate_ollama_content(request: OllamaApiRequest):
         logger.debug(f"Raw Ollama content: {ollama_content}")
 
         try:
-            parsed_data = json.loads(ollama_content)
-            validated_response = AnalysisResponse(**parsed_data)
+            parsed_data = orjson.loads(ollama_content)
+            validated_response = AnalysisResponse.model_validate(parsed_data) # Validates the dict directly via the compiled core schema
             logger.info("Successfully parsed and validated Ollama JSON response.")
             return validated_response
-        except json.JSONDecodeError as json_err:
+        except orjson.JSONDecodeError as json_err:
             logger.error(f"Failed to parse JSON from Ollama: {json_err}. Content: {ollama_content[:200]}...")
             raise HTTPException(status_code=502, detail=f"Failed to parse JSON from Ollama model '{config.OLLAMA_MODEL}'.")
         except Exception as pydantic_err: # Catch Pydantic validation errors
@@ -8,12 +8,22 @@ from the request, and defines endpoints for analysis, health checks, and service
 """
 
 import logging
-import json
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import random
+import re
+import string
+import time
 import sys
-from typing import Optional, Dict, Any # Use modern type hinting
+from typing import Optional, Dict, Any, List, NoReturn, Union, Callable, Awaitable, Tuple # Use modern type hinting
 
-from fastapi import APIRouter, HTTPException, status, Body # Import Body for request body description
+from fastapi import APIRouter, HTTPException, status, Body, Response # Import Body for request body description
+from fastapi.responses import JSONResponse
 import httpx # For catching specific HTTP client exceptions
+from cachetools import TTLCache
+from pydantic import ValidationError
 
 # --- Ollama Library Import ---
 try:
@@ -32,9 +42,8 @@ except Exception as e:
 
 # --- Local Imports ---
 try:
-    # Ensure Content and Part are imported for type checking during prompt extraction
     # Also import GenerationConfig to access request parameters
-    from .models import OllamaApiRequest, AnalysisResponse, Content, Part, GenerationConfig
+    from .models import OllamaApiRequest, AnalysisResponse, OllamaAnalysisOutput, BatchAnalysisItem, GenerationConfig
     from .. import config
 except ImportError as e:
     print(f"\n--- ERROR: Failed local imports in ollama_analyzer/router.py: {e} ---")
@@ -47,67 +56,554 @@ logger = logging.getLogger("ollama_analyzer")
 
 # --- Module Global State ---
 ollama_async_client: Optional[AsyncClient] = None
+_ollama_chat: Optional[Callable[..., Awaitable[Any]]] = None # ollama_async_client.chat with the fixed arguments bound
 ollama_initialized: bool = False
 ollama_init_error: Optional[str] = None
+# Settings read on every request, bound once at import (config is fixed after startup)
+_OLLAMA_MODEL: str = config.OLLAMA_MODEL
+_OLLAMA_HOST: str = config.OLLAMA_HOST
+# Context sizing (see _num_ctx_for_prompt): rough characters per token for the
+# estimate, and the output budget assumed when a request sets no maxOutputTokens
+_NUM_CTX_MIN = 256
+_CHARS_PER_TOKEN = 3.5
+_DEFAULT_OUTPUT_TOKENS = 512
+_NUM_CTX_MARGIN = 128
+# Ollama's `format`: the response JSON schema, so decoding can only produce the expected
+# fields and types (structured outputs), or plain "json" for servers without schema support.
+# OllamaAnalysisOutput's validators still apply the reasoning cap and fallback texts.
+_OLLAMA_RESPONSE_FORMAT: Union[str, Dict[str, Any]] = (
+    AnalysisResponse.model_json_schema() if config.OLLAMA_STRUCTURED_OUTPUT else "json"
+)
 # Retrieve timeout from config, provide a sensible default
 ollama_client_timeout: float = getattr(config, 'OLLAMA_TIMEOUT', 300.0) # Default 5 minutes
+# Connection pool for the httpx client inside AsyncClient: warm keep-alive connections
+# are reused across /generateContent requests instead of reconnecting per burst.
+OLLAMA_POOL_LIMITS = httpx.Limits(
+    max_connections=config.OLLAMA_MAX_CONNECTIONS,
+    max_keepalive_connections=config.OLLAMA_MAX_KEEPALIVE,
+    keepalive_expiry=config.OLLAMA_KEEPALIVE_EXPIRY_S,
+)
+OLLAMA_CONNECT_TIMEOUT = 5.0 # Seconds; fail fast when Ollama is down instead of waiting the full read timeout
+# Outputs larger than this are validated in a worker thread; typical analyses are well
+# below it and are validated inline, where a thread hop would cost more than it saves.
+OLLAMA_OFFLOAD_VALIDATION_BYTES = 8192
+# Ollama ResponseError status codes passed through to the client; anything else becomes 502
+OLLAMA_HTTP_STATUS_MAP: Dict[int, int] = { 400: status.HTTP_400_BAD_REQUEST, 404: status.HTTP_404_NOT_FOUND, 401: status.HTTP_401_UNAUTHORIZED, 429: status.HTTP_429_TOO_MANY_REQUESTS, 500: status.HTTP_500_INTERNAL_SERVER_ERROR, 503: status.HTTP_503_SERVICE_UNAVAILABLE, }
+# Transport failures of the Ollama call: exception type -> (status, log message, client detail).
+# Resolved along the exception's MRO, so subclasses (e.g. ConnectionRefusedError) match too.
+_OLLAMA_TRANSPORT_ERRORS: Dict[type, Callable[[Exception], Tuple[int, str, str]]] = {
+    httpx.ReadTimeout: lambda e: (
+        status.HTTP_504_GATEWAY_TIMEOUT, f"Ollama request timed out ({ollama_client_timeout}s).",
+        f"Ollama timed out after {ollama_client_timeout}s. Check service load/increase timeout."),
+    # Every pooled connection (OLLAMA_MAX_CONNECTIONS) stayed busy for the whole timeout
+    httpx.PoolTimeout: lambda e: (
+        status.HTTP_503_SERVICE_UNAVAILABLE, f"No free Ollama connection within {ollama_client_timeout}s (pool of {config.OLLAMA_MAX_CONNECTIONS} exhausted).",
+        "Ollama analysis service is saturated. Please retry shortly."),
+    httpx.ConnectTimeout: lambda e: (
+        status.HTTP_503_SERVICE_UNAVAILABLE, f"Connecting to Ollama ({_OLLAMA_HOST}) timed out after {OLLAMA_CONNECT_TIMEOUT}s.",
+        f"Could not connect to Ollama at {_OLLAMA_HOST}."),
+    httpx.RemoteProtocolError: lambda e: (
+        status.HTTP_502_BAD_GATEWAY, f"Connection to Ollama failed unexpectedly: {e}",
+        "Connection to Ollama lost unexpectedly."),
+    httpx.ConnectError: lambda e: (
+        status.HTTP_503_SERVICE_UNAVAILABLE, f"Could not connect to Ollama ({_OLLAMA_HOST}): {e}",
+        f"Could not connect to Ollama at {_OLLAMA_HOST}."),
+}
+# The ollama SDK re-raises httpx.ConnectError as the builtin ConnectionError
+_OLLAMA_TRANSPORT_ERRORS[ConnectionError] = _OLLAMA_TRANSPORT_ERRORS[httpx.ConnectError]
+
+# --- Response Cache ---
+# Deterministic (low-temperature) generations are cached by a blake2b digest of
+# model + options + normalized prompt; see OLLAMA_CACHE_* in config.py.
+_ollama_cache: Optional[TTLCache] = (
+    TTLCache(maxsize=config.OLLAMA_CACHE_SIZE, ttl=config.OLLAMA_CACHE_TTL_S)
+    if config.OLLAMA_CACHE_SIZE > 0 else None
+)
+_ollama_cache_hits: int = 0
+_ollama_cache_misses: int = 0
+# Shared tasks of requests currently being generated, by request key (see _ollama_request_key)
+_ollama_inflight: Dict[bytes, "asyncio.Future[OllamaAnalysisOutput]"] = {}
+_ollama_coalesced: int = 0
+# Bounds the concurrent items of /generateContent:batch (created on first use)
+_batch_semaphore: Optional[asyncio.Semaphore] = None
+# Outermost {...} block of a model output, for outputs with text after the JSON object
+_JSON_OBJECT_PATTERN = re.compile(rb'\{.*\}', re.DOTALL)
+# Final 'Analyze this password: "<password>"' line of the frontend prompt (see src/api/ollamaService.ts)
+_PROMPT_PASSWORD_PATTERN = re.compile(r'Analyze this password: "(.*)"[ \t]*(?:<\|eot_id\|>)?[ \t]*$', re.MULTILINE)
+
+
+def _extract_prompt_password(prompt: str) -> Optional[str]:
+    """Returns the password the prompt asks to analyze, or None if the template is not recognized."""
+    matches = _PROMPT_PASSWORD_PATTERN.findall(prompt)
+    return matches[-1] if matches else None
+
+# --- Weak Password Shortcut ---
+# Trivially weak passwords get a fixed analysis without an LLM round-trip (see
+# OLLAMA_WEAK_* in config.py). The common-password set is the top of zxcvbn's
+# frequency list, which the ML analyzer already depends on.
+try:
+    from zxcvbn.frequency_lists import FREQUENCY_LISTS
+    _COMMON_PASSWORDS = frozenset(FREQUENCY_LISTS['passwords'][:config.OLLAMA_WEAK_COMMON_TOP_N])
+except ImportError:
+    _COMMON_PASSWORDS = frozenset()
+_ollama_weak_shortcuts: int = 0
+_SYMBOLS = "!@#$%^&*-_=+?"
+_PASSWORD_ALPHABET = string.ascii_letters + string.digits + _SYMBOLS
+_secure_random = random.SystemRandom() # OS CSPRNG, as in the secrets module
+
+
+def _generate_improved_password(length: int = 16) -> str:
+    """Random password meeting the frontend's rules: 1+ lower, upper and digit, 2+ distinct symbols."""
+    required = [_secure_random.choice(string.ascii_lowercase), _secure_random.choice(string.ascii_uppercase),
+                _secure_random.choice(string.digits), *_secure_random.sample(_SYMBOLS, 2)]
+    chars = required + [_secure_random.choice(_PASSWORD_ALPHABET) for _ in range(length - len(required))]
+    _secure_random.shuffle(chars)
+    return "".join(chars)
+
+
+def _weak_password_analysis(password: str) -> Optional[AnalysisResponse]:
+    """Returns the fixed analysis for a trivially weak password, or None if the LLM should analyze it."""
+    if len(password) < config.OLLAMA_WEAK_MIN_LENGTH:
+        reason = f"The password is only {len(password)} characters long; anything under {config.OLLAMA_WEAK_MIN_LENGTH} can be brute-forced almost instantly."
+    elif password.lower() in _COMMON_PASSWORDS:
+        reason = "The password is one of the most commonly used passwords and is tried first in every guessing attack."
+    else:
+        return None
+    # Fixed texts and a generated password: nothing here needs validating
+    return AnalysisResponse.model_construct(
+        suggestions=[
+            "Use at least 12-16 characters.",
+            "Mix upper and lower case letters, numbers and symbols.",
+            "Avoid common passwords, names and dictionary words, or use a passphrase of several unrelated words.",
+        ],
+        reasoning=[reason, "Attackers' wordlists and rules crack passwords like this immediately."],
+        improvedPassword=_generate_improved_password(),
+    )
+
+
+def _ollama_cacheable(options: Dict[str, Any]) -> bool:
+    """Whether outputs generated with `options` may be cached (deterministic enough to reuse)."""
+    temperature = options.get('temperature')
+    return _ollama_cache is not None and temperature is not None and temperature <= config.OLLAMA_CACHE_MAX_TEMPERATURE
+
+
+def _ollama_request_key(prompt: str, options: Dict[str, Any]) -> bytes:
+    """Digest identifying an analysis: requests with the same key get the same answer."""
+    # Surrounding whitespace does not change the analysis, so it is not part of the key
+    cache_subject = prompt.strip()
+    if config.OLLAMA_CACHE_BY_PASSWORD:
+        password = _extract_prompt_password(prompt)
+        if password is not None:
+            cache_subject = f"password\0{password}"
+    key_material = f"{_OLLAMA_MODEL}\0{sorted(options.items())}\0{cache_subject}"
+    return hashlib.blake2b(key_material.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
 
 # --- Router Definition ---
 router = APIRouter()
 
-# --- Lifespan Events (Startup and Shutdown) ---
-@router.on_event("startup")
-async def startup_ollama_client():
-    """Initializes the Ollama AsyncClient during application startup."""
-    global ollama_async_client, ollama_initialized, ollama_init_error, ollama_client_timeout
+# --- Lazy Initialization ---
+# Startup only constructs the AsyncClient (no network I/O), so the API starts even when
+# Ollama is not up yet. The connectivity check runs on the first request that needs
+# Ollama; a failed check is retried after OLLAMA_INIT_RETRY_S instead of on every request.
+OLLAMA_INIT_RETRY_S = 10.0
+_ollama_init_lock: Optional[asyncio.Lock] = None
+_ollama_last_init_attempt: float = 0.0
+
+
+async def _ensure_initialized() -> bool:
+    """Verifies Ollama connectivity once (on first use); returns True when the client is ready."""
+    global ollama_initialized, ollama_init_error, _ollama_init_lock, _ollama_last_init_attempt
     if ollama_initialized:
+        return True
+    if ollama_async_client is None:
+        return False
+    if _ollama_init_lock is None:
+        _ollama_init_lock = asyncio.Lock()
+    async with _ollama_init_lock:
+        if ollama_initialized: # Another request finished the check while we waited
+            return True
+        if ollama_init_error and time.monotonic() - _ollama_last_init_attempt < OLLAMA_INIT_RETRY_S:
+            return False
+        _ollama_last_init_attempt = time.monotonic()
+        try:
+            logger.info(f"Checking Ollama connectivity: host={_OLLAMA_HOST}")
+            await ollama_async_client.list() # Perform a quick check to verify connectivity
+            logger.info(f"Ollama AsyncClient initialized successfully. Host '{_OLLAMA_HOST}' reachable.")
+            ollama_initialized = True
+            ollama_init_error = None
+        # Specific error handling for common initialization issues
+        except (httpx.ConnectError, ConnectionError) as e:
+            ollama_init_error = f"Connection Error: Cannot connect to Ollama at {_OLLAMA_HOST}. Is 'ollama serve' running? Error: {e}"
+            logger.error(ollama_init_error)
+        except httpx.TimeoutException as e:
+            ollama_init_error = f"Timeout Error: Connection to Ollama ({_OLLAMA_HOST}) timed out. Error: {e}"
+            logger.error(ollama_init_error)
+        except ResponseError as e:
+            ollama_init_error = f"Ollama API Error during init: Status {e.status_code} - {e.error}. Host: {_OLLAMA_HOST}"
+            logger.error(ollama_init_error)
+        except Exception as e: # Catch any other unexpected errors
+            ollama_init_error = f"Unexpected error during Ollama client init: {type(e).__name__} - {e}"
+            logger.exception(ollama_init_error) # Log full traceback
+        if not ollama_initialized:
+            logger.error(f"Ollama connectivity check FAILED; retrying on a request after {OLLAMA_INIT_RETRY_S}s.")
+        return ollama_initialized
+
+_aiohttp_session: Optional["aiohttp.ClientSession"] = None
+
+
+def _create_http_transport() -> Optional[httpx.AsyncBaseTransport]:
+    """
+    Returns an aiohttp-backed transport sized from the Ollama pool settings, or None
+    to let httpx build its default transport from OLLAMA_POOL_LIMITS.
+    Must be called from a running event loop (aiohttp binds its session to it).
+    """
+    global _aiohttp_session
+    if not config.OLLAMA_AIOHTTP_TRANSPORT:
+        return None
+    # Imported here rather than at module load: aiohttp is only needed when this transport
+    # is enabled, and its import graph is a noticeable part of the API's cold start.
+    try:
+        import aiohttp
+        from httpx_aiohttp import AiohttpTransport
+    except ImportError:
+        logger.info("httpx-aiohttp not installed; using the default httpx transport for Ollama (pip install httpx-aiohttp to enable it).")
+        return None
+    _aiohttp_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+        limit=config.OLLAMA_MAX_CONNECTIONS,
+        limit_per_host=config.OLLAMA_MAX_CONNECTIONS, # Only one host (OLLAMA_HOST) is ever contacted
+        keepalive_timeout=config.OLLAMA_KEEPALIVE_EXPIRY_S,
+    ))
+    logger.info("Using aiohttp transport for Ollama requests.")
+    return AiohttpTransport(client=_aiohttp_session)
+
+
+def _http2_enabled() -> bool:
+    """True when OLLAMA_HTTP2 is set and the 'h2' package httpx needs for it is installed."""
+    if not config.OLLAMA_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("OLLAMA_HTTP2 is enabled but the 'h2' package is missing (pip install 'httpx[http2]'); using HTTP/1.1.")
+        return False
+    logger.info("Using HTTP/2 for Ollama requests.")
+    return True
+
+
+# --- Lifespan Events (Startup and Shutdown; called from the app lifespan in main.py) ---
+async def startup_ollama_client():
+    """Constructs the Ollama AsyncClient during application startup (no network I/O)."""
+    global ollama_async_client, _ollama_chat, ollama_initialized, ollama_init_error, ollama_client_timeout
+    if ollama_initialized or ollama_async_client is not None:
         logger.info("Ollama client already initialized.")
         return
 
-    logger.info("Ollama Analyzer Router: Initializing AsyncClient...")
+    logger.info("Ollama Analyzer Router: Creating AsyncClient (connectivity is checked on first use)...")
     try:
-        logger.info(f"Connecting to Ollama: host={config.OLLAMA_HOST}, timeout={ollama_client_timeout}s")
-        ollama_async_client = AsyncClient(host=config.OLLAMA_HOST, timeout=ollama_client_timeout)
-        await ollama_async_client.list() # Perform a quick check to verify connectivity
-        logger.info(f"Ollama AsyncClient initialized successfully. Host '{config.OLLAMA_HOST}' reachable.")
-        ollama_initialized = True
+        logger.info(f"Ollama client settings: host={_OLLAMA_HOST}, timeout={ollama_client_timeout}s")
+        http2 = _http2_enabled()
+        # Extra keyword arguments are passed through to the underlying httpx.AsyncClient;
+        # `limits` only applies when no custom transport is given.
+        ollama_async_client = AsyncClient(
+            host=_OLLAMA_HOST,
+            timeout=httpx.Timeout(ollama_client_timeout, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=OLLAMA_POOL_LIMITS,
+            http2=http2,
+            transport=None if http2 else _create_http_transport(),
+        )
+        # model, format and streaming are the same for every analysis, so they are bound once
+        _ollama_chat = functools.partial(
+            ollama_async_client.chat,
+            model=_OLLAMA_MODEL,
+            format=_OLLAMA_RESPONSE_FORMAT, # Crucial: Request (schema-constrained) JSON output directly from Ollama
+            stream=True, # Chunks are appended to one buffer instead of buffering the full response object
+        )
         ollama_init_error = None
-    # Specific error handling for common initialization issues
-    except httpx.ConnectError as e:
-        error_msg = f"Connection Error: Cannot connect to Ollama at {config.OLLAMA_HOST}. Is 'ollama serve' running? Error: {e}"
-        logger.error(error_msg)
-        ollama_init_error = error_msg
-    except httpx.Timeout as e:
-        error_msg = f"Timeout Error: Connection to Ollama ({config.OLLAMA_HOST}) timed out after {ollama_client_timeout}s. Error: {e}"
-        logger.error(error_msg)
-        ollama_init_error = error_msg
-    except ResponseError as e:
-        error_msg = f"Ollama API Error during init: Status {e.status_code} - {e.error}. Host: {config.OLLAMA_HOST}"
-        logger.error(error_msg)
-        ollama_init_error = error_msg
-    except Exception as e: # Catch any other unexpected errors
-        error_msg = f"Unexpected error during Ollama client init: {type(e).__name__} - {e}"
-        logger.exception(error_msg) # Log full traceback
-        ollama_init_error = error_msg
-    finally: # Ensure state reflects the outcome
-        if ollama_init_error:
-            ollama_async_client = None
-            ollama_initialized = False
-            logger.error("Ollama client initialization FAILED.")
-        else:
-            logger.info("Ollama client initialization SUCCEEDED.")
+    except Exception as e: # e.g. a malformed OLLAMA_HOST
+        ollama_init_error = f"Unexpected error during Ollama client init: {type(e).__name__} - {e}"
+        logger.exception(ollama_init_error)
+        ollama_async_client = None
+        _ollama_chat = None
+        ollama_initialized = False
+        logger.error("Ollama client creation FAILED.")
 
 
-@router.on_event("shutdown")
 async def shutdown_ollama_client():
     """Cleans up Ollama client resources during application shutdown."""
-    global ollama_async_client, ollama_initialized, ollama_init_error
+    global ollama_async_client, _ollama_chat, ollama_initialized, ollama_init_error, _ollama_last_init_attempt, _aiohttp_session, _health_last_ok, _health_last_failure
     logger.info("Ollama Analyzer Router: Shutting down...")
-    # Clear global references; AsyncClient doesn't require explicit close
+    if ollama_async_client is not None:
+        try:
+            await ollama_async_client.close() # Releases the pooled keep-alive connections
+        except Exception as e:
+            logger.warning(f"Error while closing Ollama AsyncClient: {type(e).__name__} - {e}")
+    if _aiohttp_session is not None:
+        try:
+            await _aiohttp_session.close()
+        except Exception as e:
+            logger.warning(f"Error while closing aiohttp session: {type(e).__name__} - {e}")
     ollama_async_client = None
+    _ollama_chat = None
+    _aiohttp_session = None
     ollama_initialized = False
     ollama_init_error = None
-    logger.info("Ollama AsyncClient reference cleared.")
+    _ollama_last_init_attempt = 0.0
+    _health_last_ok = None
+    _health_last_failure = None
+    logger.info("Ollama AsyncClient closed and reference cleared.")
+
+
+# --- Ollama Call Helpers ---
+def _parse_ollama_output(raw_content: bytes) -> OllamaAnalysisOutput:
+    """
+    Parses and validates the model's JSON output. If it is not valid JSON, the outermost
+    {...} block is tried once more (recovers text trailing the object); the original
+    ValidationError is raised when that fails too.
+    """
+    try:
+        return OllamaAnalysisOutput.model_validate_json(raw_content)
+    except ValidationError as validation_err:
+        if not any(error.get('type') == 'json_invalid' for error in validation_err.errors()):
+            raise
+        embedded = _JSON_OBJECT_PATTERN.search(raw_content)
+        if embedded is None or len(embedded.group(0)) == len(raw_content.strip()):
+            raise
+        try:
+            parsed = OllamaAnalysisOutput.model_validate_json(embedded.group(0))
+        except ValidationError:
+            raise validation_err from None
+        logger.warning("Ollama output had text around its JSON object; using the embedded object.")
+        return parsed
+
+
+async def _chat_and_validate(prompt: str, ollama_options: Dict[str, Any], cache_key: Optional[bytes]) -> OllamaAnalysisOutput:
+    """Runs one Ollama chat for `prompt`, validates the JSON reply and caches it under `cache_key`."""
+    # --- Call Ollama Service ---
+    ollama_raw_content: Optional[bytearray] = None
+    try:
+        logger.info("Sending prompt to Ollama model '%s' with options...", _OLLAMA_MODEL)
+        stream = await _ollama_chat(
+            messages=[{'role': 'user', 'content': prompt}],
+            options=ollama_options, # Pass the constructed options dictionary
+        )
+
+        # --- Collect Streamed Content ---
+        # UTF-8 bytes are accumulated as they arrive and validated once, straight from the buffer
+        ollama_raw_content = bytearray()
+        response = None
+        object_started = False # Set once the first non-whitespace character has been checked
+        async for response in stream:
+            chunk = getattr(getattr(response, 'message', None), 'content', None)
+            if chunk is None:
+                continue
+            if not isinstance(chunk, str):
+                logger.error(f"Ollama message content is not a string. Type: {type(chunk)}. Value: {chunk}")
+                raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Ollama returned non-string content.")
+            if not object_started and chunk.strip():
+                # Anything but a JSON object can never validate: stop the generation early
+                # (closing the stream drops the connection, which cancels it in Ollama)
+                if chunk.lstrip()[0] != '{':
+                    await stream.aclose()
+                    logger.error(f"Ollama output is not a JSON object (starts with {chunk.lstrip()[:20]!r}). Generation aborted.")
+                    raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Ollama response is not a JSON object.")
+                object_started = True
+            ollama_raw_content += chunk.encode('utf-8', 'surrogatepass')
+            if len(ollama_raw_content) > config.OLLAMA_MAX_RESPONSE_BYTES:
+                await stream.aclose() # Stops the runaway generation in Ollama as well
+                logger.error("Ollama output exceeded %d bytes. Generation aborted.", config.OLLAMA_MAX_RESPONSE_BYTES)
+                raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Ollama response exceeds the {config.OLLAMA_MAX_RESPONSE_BYTES}-byte limit.")
+
+        if response is None:
+            logger.error("Invalid response structure from Ollama. The response stream was empty.")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Invalid response structure from Ollama.")
+
+        # Log response details (reported on the final 'done' chunk); only looked up when INFO is on
+        if logger.isEnabledFor(logging.INFO):
+            duration_ns = getattr(response, 'total_duration', None) # Streamed chunks are typed ChatResponse objects
+            duration_s = f"{(duration_ns / 1e9):.3f}" if duration_ns else 'N/A'
+            eval_count = getattr(response, 'eval_count', 'N/A')
+            logger.info("Received response from Ollama. Duration: %ss, Eval Count: %s, Content: %d bytes", duration_s, eval_count, len(ollama_raw_content))
+        if logger.isEnabledFor(logging.DEBUG): # Skip the repr and the slice/decode copies otherwise
+            logger.debug("Final Ollama response chunk (type: %s): %s", type(response), response)
+            logger.debug("Raw Ollama JSON received (first 500 bytes): %s...", ollama_raw_content[:500].decode('utf-8', 'replace'))
+
+        # --- Parse, Post-Process, and Validate the JSON Content ---
+        # A single model_validate_json() call parses the JSON in pydantic-core and runs
+        # the cleanup validators of OllamaAnalysisOutput (see models.py).
+        try:
+            if len(ollama_raw_content) > OLLAMA_OFFLOAD_VALIDATION_BYTES:
+                # Large outputs are validated off the event loop so other requests keep flowing
+                validated_response = await asyncio.to_thread(_parse_ollama_output, ollama_raw_content)
+            else:
+                validated_response = _parse_ollama_output(ollama_raw_content)
+            logger.info("Successfully parsed, cleaned, and validated Ollama JSON response.")
+            if cache_key is not None:
+                _ollama_cache[cache_key] = validated_response
+            return validated_response
+
+        except ValidationError as validation_err:
+            if any(error.get('type') == 'json_invalid' for error in validation_err.errors()):
+                logger.error("Failed to parse JSON response from Ollama '%s': %s", _OLLAMA_MODEL, validation_err)
+                logger.error(f"Ollama raw content (parsing error): {ollama_raw_content[:500].decode('utf-8', 'replace')}")
+                raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Failed to parse JSON from Ollama. Error: {validation_err.errors()[0].get('msg')}. Snippet: {ollama_raw_content[:100].decode('utf-8', 'replace')}...")
+            logger.error("Failed validating Ollama JSON against AnalysisResponse: %s", validation_err)
+            logger.error(f"Original raw Ollama content: {ollama_raw_content[:500].decode('utf-8', 'replace')}...")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Ollama response structure mismatch or validation error: {validation_err}")
+
+    # --- Handle Specific Ollama/HTTPX Errors during the API call ---
+    except ResponseError as e:
+        logger.error("Ollama API Error during chat: %s (Status: %s)", e.error, e.status_code)
+        http_status = OLLAMA_HTTP_STATUS_MAP.get(e.status_code, status.HTTP_502_BAD_GATEWAY)
+        detail = f"Ollama service error: {e.error}"
+        if http_status == 404: detail = f"Ollama model '{_OLLAMA_MODEL}' not found at '{_OLLAMA_HOST}'."
+        elif "connection refused" in str(e.error).lower(): http_status, detail = 503, f"Connection to Ollama ({_OLLAMA_HOST}) refused."
+        raise HTTPException(status_code=http_status, detail=detail)
+    except HTTPException:
+        raise # Re-raise already handled HTTPExceptions
+    except Exception as e:
+        for exc_type in type(e).__mro__:
+            describe = _OLLAMA_TRANSPORT_ERRORS.get(exc_type)
+            if describe is not None:
+                http_status, log_message, detail = describe(e)
+                logger.error(log_message)
+                raise HTTPException(status_code=http_status, detail=detail)
+        logger.exception(f"Unexpected error during Ollama analysis: {type(e).__name__}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Unexpected internal backend error: {type(e).__name__}")
+
+
+def _release_inflight(request_key: bytes, task: asyncio.Future) -> None:
+    """Done-callback of a shared Ollama task: forgets it and marks its exception as retrieved."""
+    _ollama_inflight.pop(request_key, None)
+    if not task.cancelled():
+        task.exception()
+
+
+def _num_ctx_for_prompt(prompt: str, max_output_tokens: Optional[int]) -> int:
+    """
+    Context window for one request: the estimated prompt tokens plus the output budget,
+    rounded up to a power of two (so only a handful of sizes reach Ollama) and kept
+    within [_NUM_CTX_MIN, config.OLLAMA_NUM_CTX]. Ollama's KV cache scales with num_ctx,
+    so short prompts no longer reserve the full window.
+    """
+    if not config.OLLAMA_DYNAMIC_NUM_CTX:
+        return config.OLLAMA_NUM_CTX
+    needed = int(len(prompt) / _CHARS_PER_TOKEN) + (max_output_tokens or _DEFAULT_OUTPUT_TOKENS) + _NUM_CTX_MARGIN
+    num_ctx = _NUM_CTX_MIN
+    while num_ctx < needed and num_ctx < config.OLLAMA_NUM_CTX:
+        num_ctx *= 2
+    return min(num_ctx, config.OLLAMA_NUM_CTX)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_ollama_options(num_ctx: int, temperature: Optional[float], top_k: Optional[int],
+                          top_p: Optional[float], max_output_tokens: Optional[int]) -> Dict[str, Any]:
+    """
+    Maps generationConfig values to ollama-python options. Memoized, since clients
+    send the same few configurations: the returned dict is shared and must not be mutated.
+    """
+    options: Dict[str, Any] = {'num_ctx': num_ctx}
+    if temperature is not None:
+        options['temperature'] = temperature
+    if top_k is not None:
+        options['top_k'] = top_k
+    if top_p is not None:
+        options['top_p'] = top_p
+    # Map maxOutputTokens (JS/Frontend name) to num_predict (ollama option name)
+    if max_output_tokens is not None:
+        options['num_predict'] = max_output_tokens
+    return options
+
+
+def _reject_request_format(request: OllamaApiRequest, reason: str) -> NoReturn:
+    """Logs and raises the 400 for a request whose prompt cannot be extracted."""
+    logger.error("Failed to extract prompt from invalid request format: %s", reason)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Invalid request dump: %s", request.model_dump(exclude_unset=True))
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid request format. Error: {reason}")
+
+
+async def _analyze_single(request: OllamaApiRequest) -> AnalysisResponse:
+    """Analyzes one request (prompt extraction, options, cache, coalescing); raises HTTPException on failure."""
+    logger.info("Processing Ollama analysis request using model: %s", _OLLAMA_MODEL)
+
+    # --- Extract Prompt from Request Body ---
+    # Types are already enforced by OllamaApiRequest; only emptiness needs checking here
+    if not request.contents:
+        _reject_request_format(request, "Request 'contents' list is missing or empty.")
+    content_item = request.contents[0]
+    if not content_item['parts']:
+        _reject_request_format(request, "Request 'parts' list is missing or empty in the first content item.")
+    prompt = content_item['parts'][0]['text']
+    if not prompt or prompt.isspace(): # No stripped copy of the (multi-KB) prompt
+        _reject_request_format(request, "Extracted prompt text is empty.")
+    logger.debug("Extracted prompt (first 100 chars): '%.100s...'", prompt)
+
+    if config.OLLAMA_WEAK_SHORTCUT:
+        password = _extract_prompt_password(prompt)
+        if password is not None:
+            weak_analysis = _weak_password_analysis(password)
+            if weak_analysis is not None:
+                global _ollama_weak_shortcuts
+                _ollama_weak_shortcuts += 1
+                logger.info("Trivially weak password; answering without Ollama.")
+                return weak_analysis
+
+    # --- Construct Ollama Options from Request's generationConfig ---
+    gen_config = request.generation_config # Alias for easier access
+    if gen_config:
+        if logger.isEnabledFor(logging.INFO): # model_dump() only when the line is emitted
+            logger.info("Applying generation config from request: %s", gen_config.model_dump(exclude_unset=True, by_alias=False))
+        num_ctx = _num_ctx_for_prompt(prompt, gen_config.max_output_tokens)
+        ollama_options = _build_ollama_options(num_ctx, gen_config.temperature, gen_config.top_k, gen_config.top_p, gen_config.max_output_tokens)
+    else:
+        ollama_options = _build_ollama_options(_num_ctx_for_prompt(prompt, None), None, None, None, None)
+    # Note: responseMimeType is handled by the 'format' parameter of .chat() (see _OLLAMA_RESPONSE_FORMAT), not an option.
+
+    logger.debug("Ollama API call final options: %s", ollama_options)
+
+    global _ollama_cache_hits, _ollama_cache_misses
+    request_key = _ollama_request_key(prompt, ollama_options)
+    cache_key = request_key if _ollama_cacheable(ollama_options) else None
+    if cache_key is not None:
+        cached_response = _ollama_cache.get(cache_key)
+        if cached_response is not None:
+            _ollama_cache_hits += 1
+            logger.info("Serving Ollama analysis from response cache.")
+            return cached_response
+        _ollama_cache_misses += 1
+
+    # --- Coalesce Identical In-Flight Requests ---
+    # Concurrent identical requests (e.g. a double-clicked check) share one Ollama
+    # generation, cacheable or not: the cache covers repeats after it finishes, this
+    # covers repeats while it runs. The shared task is shielded so a disconnecting
+    # caller does not cancel it for the others.
+    global _ollama_coalesced
+    inflight = _ollama_inflight.get(request_key)
+    if inflight is not None:
+        _ollama_coalesced += 1
+        logger.info("Joining identical in-flight Ollama request.")
+        return await asyncio.shield(inflight)
+    inflight = asyncio.ensure_future(_chat_and_validate(prompt, ollama_options, cache_key))
+    _ollama_inflight[request_key] = inflight
+    inflight.add_done_callback(lambda task: _release_inflight(request_key, task))
+    return await asyncio.shield(inflight)
+
+
+async def _analyze_bounded(request: OllamaApiRequest) -> AnalysisResponse:
+    """_analyze_single() limited to OLLAMA_BATCH_CONCURRENCY concurrent batch items."""
+    global _batch_semaphore
+    if _batch_semaphore is None:
+        _batch_semaphore = asyncio.Semaphore(config.OLLAMA_BATCH_CONCURRENCY)
+    async with _batch_semaphore:
+        return await _analyze_single(request)
+
+@functools.lru_cache(maxsize=8)
+def _unavailable_response(init_error: Optional[str]) -> JSONResponse:
+    """
+    The 503 returned while the client is not initialized, rendered once per init error:
+    when Ollama is down every request takes this path, so it is reused, not rebuilt.
+    """
+    detail_msg = "Ollama analysis service unavailable (initialization failure)."
+    if init_error: detail_msg += f" Reason: {init_error}"
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": detail_msg})
 
 # --- API Endpoints ---
 
@@ -135,159 +631,71 @@ async def generate_ollama_content(
     request: OllamaApiRequest = Body(..., description="Request body with prompt and optional generation config for Ollama.")
 ):
     """Endpoint to process password analysis requests via Ollama, using generation parameters."""
-    global ollama_client_timeout # Access timeout if needed for messages
 
-    # --- Pre-check: Ensure Client is Initialized ---
-    if not ollama_initialized or ollama_async_client is None:
+    # --- Pre-check: Ensure Client is Initialized (connectivity is verified on first use) ---
+    if not await _ensure_initialized():
         logger.warning("Ollama /generateContent called, but client not initialized.")
-        detail_msg = "Ollama analysis service unavailable (initialization failure)."
-        if ollama_init_error: detail_msg += f" Reason: {ollama_init_error}"
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail_msg)
+        return _unavailable_response(ollama_init_error)
 
-    logger.info(f"Processing Ollama analysis request using model: {config.OLLAMA_MODEL}")
+    analysis = await _analyze_single(request)
+    # Already validated: serialize it in one pydantic-core call instead of letting FastAPI
+    # re-validate it against response_model (which is kept for the OpenAPI schema).
+    return Response(content=analysis.model_dump_json(), media_type="application/json")
 
-    # --- Extract Prompt from Request Body ---
-    try:
-        if not request.contents: raise ValueError("Request 'contents' list is missing or empty.")
-        content_item = request.contents[0]
-        if not isinstance(content_item, Content) or not content_item.parts: raise ValueError("Request 'parts' list is missing or empty in the first content item.")
-        part_item = content_item.parts[0]
-        if not isinstance(part_item, Part) or not isinstance(part_item.text, str): raise ValueError("Request 'text' field is missing or not a string in the first part.")
-        prompt = part_item.text
-        if not prompt.strip(): raise ValueError("Extracted prompt text is empty.")
-        logger.debug(f"Extracted prompt (first 100 chars): '{prompt[:100]}...'")
-    except (AttributeError, IndexError, ValueError, TypeError) as e:
-         logger.error(f"Failed to extract prompt from invalid request format: {e}. Request dump: {request.model_dump(exclude_unset=True)}", exc_info=True)
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid request format. Error: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error extracting prompt: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error processing request body: {type(e).__name__}")
 
-    # --- Construct Ollama Options from Request's generationConfig ---
-    ollama_options: Dict[str, Any] = {
-        'num_ctx': 4096 # Default context window size (adjust as needed for your model)
+@router.post(
+    "/generateContent:batch",
+    response_model=List[BatchAnalysisItem],
+    summary="Analyze Several Passwords with Ollama",
+    description=(
+        "Runs up to OLLAMA_BATCH_MAX_ITEMS /generateContent requests concurrently (at most "
+        "OLLAMA_BATCH_CONCURRENCY at a time) and returns one item per request, in order. "
+        "A failing request yields an item with its status code and error instead of failing the batch."
+    ),
+    response_description="List of per-request analysis results or errors.",
+    status_code=status.HTTP_200_OK,
+    tags=["Ollama Analyzer"],
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Too many requests in the batch"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Ollama service unavailable"},
     }
-
-    if request.generation_config:
-        gen_config = request.generation_config # Alias for easier access
-        logger.info(f"Applying generation config from request: {gen_config.model_dump(exclude_unset=True, by_alias=False)}") # Log applied values
-
-        # Map request fields to ollama-python option keys
-        if gen_config.temperature is not None:
-            ollama_options['temperature'] = gen_config.temperature
-        if gen_config.top_k is not None:
-            ollama_options['top_k'] = gen_config.top_k
-        if gen_config.top_p is not None:
-            ollama_options['top_p'] = gen_config.top_p
-        # Map maxOutputTokens (JS/Frontend name) to num_predict (ollama option name)
-        if gen_config.max_output_tokens is not None:
-            ollama_options['num_predict'] = gen_config.max_output_tokens
-            logger.debug(f"Mapping maxOutputTokens ({gen_config.max_output_tokens}) to num_predict option.")
-        # Note: responseMimeType is handled by the 'format="json"' parameter in .chat(), not an option.
-
-    logger.debug(f"Ollama API call final options: {ollama_options}")
-
-    # --- Call Ollama Service ---
-    ollama_raw_content: Optional[str] = None
-    try:
-        logger.info(f"Sending prompt to Ollama model '{config.OLLAMA_MODEL}' with options...")
-        response = await ollama_async_client.chat(
-            model=config.OLLAMA_MODEL,
-            messages=[{'role': 'user', 'content': prompt}],
-            format="json", # Crucial: Request JSON output directly from Ollama
-            options=ollama_options # Pass the constructed options dictionary
-        )
-
-        # Log response details
-        duration_ns = response.get('total_duration') if isinstance(response, dict) else getattr(response, 'total_duration', None)
-        duration_s = f"{(duration_ns / 1e9):.3f}" if duration_ns else 'N/A'
-        eval_count = response.get('eval_count') if isinstance(response, dict) else getattr(response, 'eval_count', 'N/A')
-        logger.info(f"Received response from Ollama. Duration: {duration_s}s, Eval Count: {eval_count}")
-        logger.debug(f"Full Ollama response object (type: {type(response)}): {response}")
-
-        # --- Process Ollama Response ---
-        if not response or not hasattr(response, 'message') or not response.message or not hasattr(response.message, 'content'):
-            logger.error(f"Invalid response structure from Ollama. Missing message/content. Response: {response}")
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Invalid response structure from Ollama.")
-
-        ollama_raw_content = response.message.content
-        if not isinstance(ollama_raw_content, str):
-            logger.error(f"Ollama message content is not a string. Type: {type(ollama_raw_content)}. Value: {ollama_raw_content}")
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Ollama returned non-string content.")
-
-        logger.debug(f"Raw Ollama JSON string received (first 500 chars): {ollama_raw_content[:500]}...")
-
-        # --- Parse, Post-Process, and Validate the JSON Content ---
-        try:
-            parsed_data: Dict[str, Any] = json.loads(ollama_raw_content)
-            if not isinstance(parsed_data, dict):
-                 logger.error(f"Parsed Ollama content is not a JSON object (dict). Type: {type(parsed_data)}. Content: {ollama_raw_content[:500]}")
-                 raise TypeError(f"Parsed JSON is not a dictionary (got {type(parsed_data).__name__}).")
-
-            # --- START POST-PROCESSING & CLEANUP ---
-            raw_reasoning = parsed_data.get("reasoning"); cleaned_reasoning = []
-            if isinstance(raw_reasoning, list): cleaned_reasoning = [str(item).strip() for item in raw_reasoning if isinstance(item, str) and str(item).strip()][:2]
-            elif isinstance(raw_reasoning, str): cleaned_reasoning = [raw_reasoning.strip()] if raw_reasoning.strip() else []
-            if not cleaned_reasoning: logger.warning(f"Ollama 'reasoning' invalid/missing ({type(raw_reasoning)}). Defaulting."); cleaned_reasoning = ["Analysis details not provided."]
-            parsed_data["reasoning"] = cleaned_reasoning
-
-            raw_suggestions = parsed_data.get("suggestions"); cleaned_suggestions = []
-            if isinstance(raw_suggestions, list): cleaned_suggestions = [str(item).strip() for item in raw_suggestions if isinstance(item, str) and str(item).strip()]
-            elif isinstance(raw_suggestions, str): cleaned_suggestions = [raw_suggestions.strip()] if raw_suggestions.strip() else []
-            if not cleaned_suggestions: logger.warning(f"Ollama 'suggestions' invalid/missing ({type(raw_suggestions)}). Defaulting."); cleaned_suggestions = ["No specific suggestions provided."]
-            parsed_data["suggestions"] = cleaned_suggestions
-
-            raw_improved_pw = parsed_data.get("improvedPassword"); cleaned_improved_pw = None
-            if isinstance(raw_improved_pw, str) and raw_improved_pw.strip(): cleaned_improved_pw = raw_improved_pw.strip()
-            else: logger.warning(f"Ollama 'improvedPassword' invalid/missing ({type(raw_improved_pw)}). Setting None.")
-            parsed_data["improvedPassword"] = cleaned_improved_pw
-            # --- END POST-PROCESSING ---
-
-            validated_response = AnalysisResponse(**parsed_data)
-            logger.info("Successfully parsed, cleaned, and validated Ollama JSON response.")
-            return validated_response
-
-        except json.JSONDecodeError as json_err:
-            logger.error(f"Failed to parse JSON response from Ollama '{config.OLLAMA_MODEL}': {json_err}", exc_info=True)
-            logger.error(f"Ollama raw content (parsing error): {ollama_raw_content[:500]}")
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Failed to parse JSON from Ollama. Error: {json_err}. Snippet: {ollama_raw_content[:100]}...")
-        except (TypeError, ValueError, KeyError) as process_err:
-             logger.error(f"Error processing parsed/cleaned JSON data: {process_err}", exc_info=True)
-             logger.error(f"Data causing processing error: {parsed_data if 'parsed_data' in locals() else 'N/A'}")
-             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Error processing Ollama response content: {process_err}")
-        except Exception as validation_err: # Catches Pydantic's ValidationError and others
-             logger.error(f"Failed validating cleaned JSON against AnalysisResponse: {validation_err}", exc_info=True)
-             logger.error(f"Cleaned data failing validation: {parsed_data if 'parsed_data' in locals() else 'N/A'}")
-             logger.error(f"Original raw Ollama content: {ollama_raw_content[:500]}...")
-             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Ollama response structure mismatch or validation error: {validation_err}")
-
-    # --- Handle Specific Ollama/HTTPX Errors during the API call ---
-    except ResponseError as e:
-        logger.error(f"Ollama API Error during chat: {e.error} (Status: {e.status_code})", exc_info=True)
-        http_status_map = { 400: status.HTTP_400_BAD_REQUEST, 404: status.HTTP_404_NOT_FOUND, 401: status.HTTP_401_UNAUTHORIZED, 429: status.HTTP_429_TOO_MANY_REQUESTS, 500: status.HTTP_500_INTERNAL_SERVER_ERROR, 503: status.HTTP_503_SERVICE_UNAVAILABLE, }
-        http_status = http_status_map.get(e.status_code, status.HTTP_502_BAD_GATEWAY)
-        detail = f"Ollama service error: {e.error}"
-        if http_status == 404: detail = f"Ollama model '{config.OLLAMA_MODEL}' not found at '{config.OLLAMA_HOST}'."
-        elif "connection refused" in str(e.error).lower(): http_status, detail = 503, f"Connection to Ollama ({config.OLLAMA_HOST}) refused."
-        raise HTTPException(status_code=http_status, detail=detail)
-    except httpx.ReadTimeout:
-        logger.error(f"Ollama request timed out ({ollama_client_timeout}s).", exc_info=False)
-        detail_msg = f"Ollama timed out after {ollama_client_timeout}s. Check service load/increase timeout."
-        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=detail_msg)
-    except httpx.RemoteProtocolError as e:
-        logger.error(f"Connection to Ollama failed unexpectedly: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Connection to Ollama lost unexpectedly.")
-    except httpx.ConnectError as e:
-        logger.error(f"Could not connect to Ollama ({config.OLLAMA_HOST}): {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Could not connect to Ollama at {config.OLLAMA_HOST}.")
-    except HTTPException:
-        raise # Re-raise already handled HTTPExceptions
-    except Exception as e:
-        logger.exception(f"Unexpected error during Ollama analysis: {type(e).__name__}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Unexpected internal backend error: {type(e).__name__}")
-
+)
+async def generate_ollama_content_batch(
+    requests: List[OllamaApiRequest] = Body(..., description="List of /generateContent request bodies.")
+):
+    """Endpoint to process several password analysis requests via Ollama concurrently."""
+    if len(requests) > config.OLLAMA_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Batch contains {len(requests)} requests; the maximum is {config.OLLAMA_BATCH_MAX_ITEMS}.")
+
+    if not await _ensure_initialized():
+        logger.warning("Ollama /generateContent:batch called, but client not initialized.")
+        return _unavailable_response(ollama_init_error)
+
+    logger.info("Processing Ollama batch of %d requests.", len(requests))
+    outcomes = await asyncio.gather(*(_analyze_bounded(item) for item in requests), return_exceptions=True)
+
+    # Items are built from a status code, a string and an already validated analysis,
+    # so model_construct skips validating them again
+    results: List[BatchAnalysisItem] = []
+    for outcome in outcomes:
+        if isinstance(outcome, HTTPException):
+            results.append(BatchAnalysisItem.model_construct(status_code=outcome.status_code, error=str(outcome.detail)))
+        elif isinstance(outcome, BaseException):
+            logger.error(f"Unexpected error in Ollama batch item: {type(outcome).__name__} - {outcome}")
+            results.append(BatchAnalysisItem.model_construct(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, error=f"Unexpected internal backend error: {type(outcome).__name__}"))
+        else:
+            results.append(BatchAnalysisItem.model_construct(status_code=status.HTTP_200_OK, result=outcome))
+    return results
 
 # --- Health Check Endpoint ---
+# A successful live check is reused for OLLAMA_HEALTH_CACHE_S so frequent readiness
+# probes do not each cost a round-trip to the Ollama host. Failures are reused only
+# briefly (OLLAMA_HEALTH_FAILURE_CACHE_S) so recovery is noticed quickly.
+OLLAMA_HEALTH_CACHE_S = 5.0
+OLLAMA_HEALTH_FAILURE_CACHE_S = 1.0
+_health_last_ok: Optional[float] = None # time.monotonic() of the last successful live check
+_health_last_failure: Optional[Tuple[float, str]] = None # time.monotonic() and reason of the last failed live check
+
 @router.get(
     "/health",
     summary="Ollama Service Health Check",
@@ -302,23 +710,35 @@ async def generate_ollama_content(
 async def health_check_ollama():
     """Checks Ollama service initialization and live connectivity."""
     logger.debug("Performing Ollama health check...")
-    if not ollama_initialized or ollama_async_client is None:
+    if not await _ensure_initialized():
         logger.warning(f"Health Check Fail: Not initialized. Reason: {ollama_init_error}")
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"status": "unhealthy", "reason": ollama_init_error or "Init failed."})
 
+    global _health_last_ok, _health_last_failure
+    now = time.monotonic()
+    if _health_last_ok is not None and now - _health_last_ok < OLLAMA_HEALTH_CACHE_S:
+        logger.debug("Health Check OK: served from the last live check.")
+        return {"status": "ok", "message": f"Ollama client initialized, host '{_OLLAMA_HOST}' responding."}
+    if _health_last_failure is not None and now - _health_last_failure[0] < OLLAMA_HEALTH_FAILURE_CACHE_S:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"status": "unhealthy", "reason": _health_last_failure[1]})
+
     try:
         await ollama_async_client.list() # Use a lightweight API call
+        _health_last_ok = time.monotonic()
+        _health_last_failure = None
         logger.info("Health Check OK: Initialized and host responding.")
-        return {"status": "ok", "message": f"Ollama client initialized, host '{config.OLLAMA_HOST}' responding."}
-    except (ResponseError, httpx.HTTPStatusError, httpx.RequestError) as e:
+        return {"status": "ok", "message": f"Ollama client initialized, host '{_OLLAMA_HOST}' responding."}
+    except (ResponseError, httpx.HTTPStatusError, httpx.RequestError, ConnectionError) as e:
         error_type = type(e).__name__; error_detail = str(e)
         if isinstance(e, ResponseError): error_detail = f"API Error {e.status_code}: {e.error}"
         logger.warning(f"Health Check Fail: Live check failed ({error_type}): {error_detail}", exc_info=False)
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"status": "unhealthy", "reason": f"Live check failed: {error_type} - {error_detail}"})
+        reason = f"Live check failed: {error_type} - {error_detail}"
     except Exception as e:
         logger.exception("Health Check Fail: Unexpected error during live check.")
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"status": "unhealthy", "reason": f"Unexpected live check error: {type(e).__name__}"})
-
+        reason = f"Unexpected live check error: {type(e).__name__}"
+    _health_last_ok = None
+    _health_last_failure = (time.monotonic(), reason)
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"status": "unhealthy", "reason": reason})
 
 # --- Root Endpoint for this Router ---
 @router.get(
@@ -339,9 +759,18 @@ async def read_ollama_root():
         "service_name": "Ollama Password Analyzer",
         "description": "Analyzes passwords via local Ollama LLM.",
         "config": {
-            "model": config.OLLAMA_MODEL,
-            "host": config.OLLAMA_HOST,
+            "model": _OLLAMA_MODEL,
+            "host": _OLLAMA_HOST,
             "timeout_s": ollama_client_timeout
         },
         "client_status": status_detail,
+        "response_cache": {
+            "enabled": _ollama_cache is not None,
+            "entries": len(_ollama_cache) if _ollama_cache is not None else 0,
+            "hits": _ollama_cache_hits,
+            "misses": _ollama_cache_misses,
+            "coalesced": _ollama_coalesced,
+            "in_flight": len(_ollama_inflight),
+        },
+        "weak_password_shortcuts": _ollama_weak_shortcuts,
     }
\ No newline at end of file